@@ -0,0 +1,55 @@
+import unicodedata
+import pandas as pd
+
+# Campos estruturados do endereço, na ordem em que aparecem no texto
+ADDRESS_FIELDS = ['logradouro', 'numero', 'bairro', 'municipio', 'uf']
+
+# Valores que a API devolve no lugar de "sem informação"
+_EMPTY_VALUES = r'^(?:NONE|NULL|NAN|S/N|SN|-|0)$'
+
+
+def _clean(column):
+    """
+    Upper-case, trimmed text with placeholder values turned into ''.
+    """
+    column = column.fillna('').astype(str).str.strip().str.upper()
+    column = column.str.replace(r'\s+', ' ', regex=True)
+    return column.str.replace(_EMPTY_VALUES, '', regex=True)
+
+
+def fold_accents(column):
+    return column.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+
+
+def fold_text(value):
+    """
+    Scalar version of the key folding, for lookups outside a DataFrame.
+    """
+    value = unicodedata.normalize('NFKD', str(value or '').upper())
+    return ' '.join(value.encode('ascii', 'ignore').decode('ascii').split())
+
+
+def normalize_addresses(df):
+    """
+    Build, column-wise, the display address 'endereco_1' and the canonical
+    'endereco_chave' (accent-folded, no punctuation) from the structured
+    address fields. Rows with identical keys are the same place for the
+    geocoding and join stages.
+    """
+    fields = {name: _clean(df[name]) if name in df else pd.Series('', index=df.index) for name in ADDRESS_FIELDS}
+
+    cidade = fields['municipio'].where(fields['uf'] == '', fields['municipio'] + '/' + fields['uf'])
+    cidade = cidade.str.strip('/')
+
+    endereco = fields['logradouro'].str.cat(
+        [fields['numero'], fields['bairro'], cidade], sep=', '
+    )
+    # Partes vazias deixam separadores soltos: ", , " e vírgulas nas pontas
+    endereco = endereco.str.replace(r'(?:\s*,\s*)+', ', ', regex=True).str.strip(', ')
+
+    chave = fold_accents(endereco).str.replace(r'[^A-Z0-9]+', ' ', regex=True).str.strip()
+
+    df = df.copy()
+    df['endereco_1'] = endereco
+    df['endereco_chave'] = chave
+    return df
@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# Porta padrão do servidor local; os benchmarks apontam BNMP_BASE_URL para ela
+MOCK_PORT = int(os.environ.get('BNMP_MOCK_PORT', 8765))
+API_PREFIX = '/bnmpportal/api'
+FILTER_PATH = f'{API_PREFIX}/pesquisa-pecas/filter'
+CERTIDAO_PATH = re.compile(rf'^{API_PREFIX}/certidaos/(\d+)/(\d+)$')
+ORGAOS_PATH = re.compile(rf'^{API_PREFIX}/orgaos/estado/(\d+)$')
+# Órgãos expedidores servidos (ids 1..ORGAOS, o item id_valor é do órgão id_valor % ORGAOS + 1)
+ORGAOS = 50
+
+# Mesmos nomes do PECA_MAP do bnmp.py, na ordem dos ids
+PECAS = (
+    "Mandado de Prisão", "Contramandado", "Guia de Recolhimento", "Guia de Internamento",
+    "Alvará de Soltura", "Documento de Desinternamento", "Certidão de Cumprimento das Prisões",
+    "Certidão de Extinção de Punibilidade", "Certidão de Cumprimentos das Internações",
+    "Mandado de Internação", "Guia de Recolhimento (Acervo da Execução)",
+    "Certidão de arquivamento de guia", "Guia de Internação (Acervo da Execução)",
+    "Certidão de Alteração de Unidade ou Regime Prisional",
+)
+MUNICIPIOS = (('São Paulo', 'SP'), ('Campinas', 'SP'), ('Santos', 'SP'), ('Rio de Janeiro', 'RJ'), ('Belo Horizonte', 'MG'))
+BAIRROS = ('Centro', 'Vila Nova', 'Jardim América', 'Santa Cecília', 'Boa Vista')
+TIPIFICACOES = ('Art. 157 - Roubo', 'Art. 155 - Furto', 'Art. 33 - Tráfico de Drogas', 'Art. 121 - Homicídio')
+
+
+def peca_id_of(id_valor):
+    return (id_valor - 1) % len(PECAS) + 1
+
+
+def make_listing_item(id_valor):
+    """
+    Synthetic listing item for a warrant id, always the same for the same id.
+    """
+    peca_id = peca_id_of(id_valor)
+    return {
+        'id': id_valor,
+        'idTipoPeca': peca_id,
+        'descricaoPeca': PECAS[peca_id - 1],
+        'numeroPeca': f'{id_valor:07d}.2024.8.26.0001.01.0001-{id_valor % 100:02d}',
+        'nomePessoa': f'PESSOA {id_valor}',
+        'dataExpedicao': '2024-01-01',
+        'status': 1,
+        'descricaoStatus': 'Pendente de Cumprimento',
+        'orgaoExpeditor': {'id': id_valor % ORGAOS + 1, 'nome': f'Vara {id_valor % ORGAOS + 1}'},
+    }
+
+
+def make_certidao(id_valor):
+    """
+    Synthetic certidão with the fields the post-processing reads.
+    """
+    rng = random.Random(id_valor)
+    municipio, uf = rng.choice(MUNICIPIOS)
+    return {
+        'id': id_valor,
+        'pessoa': {
+            'nome': f'PESSOA {id_valor}',
+            'enderecos': [{
+                'logradouro': f'Rua {rng.randint(1, 500)}',
+                'numero': str(rng.randint(1, 2000)),
+                'bairro': rng.choice(BAIRROS),
+                'municipio': {'nome': municipio},
+                'estado': {'sigla': uf},
+            }],
+            'documento': [{'tipoDocumento': {'descricao': 'CPF'}, 'numero': f'{rng.randrange(10 ** 11):011d}'}],
+        },
+        'tipificacaoPenal': [{'rotulo': rng.choice(TIPIFICACOES)}],
+    }
+
+
+def load_recorded(listing_path=None, responses_dir=None):
+    """
+    Listing items and certidão bodies saved by a real crawl, replayed in a
+    cycle under the synthetic ids: (items, bodies), either may be empty.
+    """
+    items, bodies = [], []
+    if listing_path:
+        with open(listing_path, encoding='utf-8') as file:
+            items = json.load(file)
+    if responses_dir:
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from response_store import segment_paths, iter_live
+        for segment in segment_paths(responses_dir):
+            for line in iter_live(responses_dir, segment):
+                record = json.loads(line)
+                if record.get('response') is not None:
+                    bodies.append(record['response'])
+    return items, bodies
+
+
+class MockConfig:
+    def __init__(self, total=3000, latency=0.0, jitter=0.0, error_rate=0.0, unauthorized_rate=0.0,
+                 seed=0, recorded_items=(), recorded_bodies=()):
+        """
+        What the mock portal serves: total warrants (ids 1..total), the delay
+        added to every response (latency plus up to jitter seconds) and the
+        share of requests answered with 503 (error_rate) or 401
+        (unauthorized_rate). Can be changed while the server runs.
+        """
+        self.total = total
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unauthorized_rate = unauthorized_rate
+        self.recorded_items = list(recorded_items)
+        self.recorded_bodies = list(recorded_bodies)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def draw(self):
+        with self.lock:
+            return self.random.random(), self.random.random(), self.random.random()
+
+    def listing_item(self, id_valor):
+        if not self.recorded_items:
+            return make_listing_item(id_valor)
+        item = dict(self.recorded_items[(id_valor - 1) % len(self.recorded_items)])
+        item.update(id=id_valor, idTipoPeca=peca_id_of(id_valor), descricaoPeca=PECAS[peca_id_of(id_valor) - 1])
+        return item
+
+    def certidao(self, id_valor):
+        if not self.recorded_bodies:
+            return make_certidao(id_valor)
+        return self.recorded_bodies[(id_valor - 1) % len(self.recorded_bodies)]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em escritas separadas; com Nagle cada resposta esperaria o ACK atrasado
+    disable_nagle_algorithm = True
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None):
+        data = json.dumps(body if body is not None else {}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.config.count(status)
+
+    def _inject(self):
+        """
+        Apply the configured latency and, when drawn, answer with an injected
+        failure. Returns True when the request was already answered.
+        """
+        config = self.config
+        jitter, unauthorized, error = config.draw()
+        if config.latency or config.jitter:
+            time.sleep(config.latency + jitter * config.jitter)
+        if unauthorized < config.unauthorized_rate:
+            self._send(401, {'message': 'Unauthorized'})
+            return True
+        if error < config.error_rate:
+            self._send(503, {'message': 'Service Unavailable'})
+            return True
+        return False
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if url.path != FILTER_PATH:
+            self._send(404, {'message': 'Not Found'})
+            return
+        if self._inject():
+            return
+
+        filtro = json.loads(body or b'{}')
+        params = parse_qs(url.query)
+        page = int(params.get('page', ['0'])[0])
+        size = int(params.get('size', ['30'])[0])
+
+        # Filtros por tipo de peça e por órgão expedidor (órgãos sem filhos: a recursão não muda nada)
+        peca_id = filtro.get('idTipoPeca')
+        orgao_id = (filtro.get('orgaoExpeditor') or {}).get('id')
+        start = page * size
+        if orgao_id is not None:
+            matched = [
+                id_valor for id_valor in range(orgao_id - 1 or ORGAOS, self.config.total + 1, ORGAOS)
+                if peca_id is None or peca_id_of(id_valor) == peca_id
+            ]
+            total, ids = len(matched), matched[start:start + size]
+        else:
+            if peca_id is None:
+                total, first, step = self.config.total, 1, 1
+            else:
+                total = max(0, (self.config.total - peca_id) // len(PECAS) + 1) if peca_id <= self.config.total else 0
+                first, step = peca_id, len(PECAS)
+            ids = [first + step * index for index in range(start, min(start + size, total))]
+        self._send(200, {
+            'content': [self.config.listing_item(id_valor) for id_valor in ids],
+            'totalElements': total,
+            'totalPages': (total + size - 1) // size if size else 0,
+            'number': page,
+            'size': size,
+        })
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if ORGAOS_PATH.match(path):
+            if not self._inject():
+                self._send(200, [{'id': orgao_id, 'nome': f'Vara {orgao_id}'} for orgao_id in range(1, ORGAOS + 1)])
+            return
+        match = CERTIDAO_PATH.match(path)
+        if match is None:
+            self._send(404, {'message': 'Not Found'})
+            return
+        if self._inject():
+            return
+        id_valor, peca_id = int(match.group(1)), int(match.group(2))
+        if not 1 <= id_valor <= self.config.total or peca_id != peca_id_of(id_valor):
+            self._send(404, {'message': 'Peça não encontrada'})
+            return
+        self._send(200, self.config.certidao(id_valor))
+
+
+class MockServer:
+    def __init__(self, config=None, host='127.0.0.1', port=MOCK_PORT):
+        """
+        Local stand-in for the BNMP portal, served from a background thread.
+        Point BNMP_BASE_URL at base_url before importing the crawler modules.
+        """
+        self.config = config or MockConfig()
+        self.httpd = ThreadingHTTPServer((host, port), MockHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = self.config
+        self.base_url = f'http://{host}:{self.httpd.server_address[1]}'
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='mock-bnmp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API do BNMP.")
+    parser.add_argument('--porta', type=int, default=MOCK_PORT)
+    parser.add_argument('--total', type=int, default=3000, help="mandados servidos (ids 1..total)")
+    parser.add_argument('--latencia', type=float, default=0.0, help="segundos somados a cada resposta")
+    parser.add_argument('--variacao', type=float, default=0.0, help="atraso aleatório extra, até este valor")
+    parser.add_argument('--erros', type=float, default=0.0, help="fração das requisições respondidas com 503")
+    parser.add_argument('--nao-autorizado', type=float, default=0.0, help="fração respondida com 401")
+    parser.add_argument('--listagem', help="JSON da listagem gravada (1.dados_gerais.json)")
+    parser.add_argument('--respostas', help="diretório de respostas gravadas (3.respostas)")
+    args = parser.parse_args(argv)
+
+    items, bodies = load_recorded(args.listagem, args.respostas)
+    config = MockConfig(args.total, args.latencia, args.variacao, args.erros, args.nao_autorizado,
+                        recorded_items=items, recorded_bodies=bodies)
+    server = MockServer(config, port=args.porta)
+    print(f"Servidor em {server.base_url}; use BNMP_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
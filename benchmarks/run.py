@@ -0,0 +1,267 @@
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from mock_server import MockServer, MockConfig, MOCK_PORT, make_listing_item, make_certidao, peca_id_of, PECAS
+
+# Os módulos do raspador leem o endereço do portal ao serem importados
+os.environ.setdefault('BNMP_BASE_URL', f'http://127.0.0.1:{MOCK_PORT}')
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+LISTING_TOTAL = 6000
+DETAIL_TOTAL = 2000
+CONCURRENCY_LEVELS = (1, 4, 8, 16)
+POSTPROCESS_SIZES = (10000, 100000, 1000000)
+# Queda de vazão, em relação à base comparada, tratada como regressão
+REGRESSION_TOLERANCE = 0.2
+
+
+@contextlib.contextmanager
+def workdir():
+    # Cada benchmark roda num diretório descartável: as etapas gravam em ./output
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='bnmp-bench-') as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+def result(benchmark, parameters, seconds, units, unit):
+    return {
+        'benchmark': benchmark,
+        'parametros': parameters,
+        'segundos': round(seconds, 4),
+        unit: units,
+        'por_segundo': round(units / seconds, 2) if seconds > 0 else None,
+    }
+
+
+def _auto_renew(scraper, stop):
+    # Faz o papel do operador: regrava os cookies e toca o gatilho de renovação
+    from session import save_cookies
+    while not stop.wait(0.05):
+        if not scraper.session.valid:
+            save_cookies({'sessao': 'benchmark'}, scraper.session.path)
+            with open(scraper.session.trigger_file, 'a'):
+                os.utime(scraper.session.trigger_file)
+
+
+def _scraper(concurrency=1):
+    import session
+    from bnmp import BNMPScraper
+    from transport import BNMPTransport
+
+    # Sem limitador: mede o cliente, não a taxa configurada para o portal real
+    session.TRIGGER_POLL_INTERVAL = 0.05
+    transport = BNMPTransport()
+    scraper = BNMPScraper({'sessao': 'benchmark'}, None, transport, concurrency=concurrency)
+    stop = threading.Event()
+    threading.Thread(target=_auto_renew, args=(scraper, stop), daemon=True).start()
+    return scraper, stop
+
+
+def bench_listing(config, total):
+    """
+    Plan and page through the whole listing (audit files included).
+    """
+    from metrics import METRICS
+    config.total = total
+    with workdir():
+        scraper, stop = _scraper()
+        pages = METRICS.total('bnmp_listing_pages_total')
+        start = time.perf_counter()
+        scraper.produce_listing(queue.Queue())
+        seconds = time.perf_counter() - start
+        pages = METRICS.total('bnmp_listing_pages_total') - pages
+        stop.set()
+        scraper.responses.close()
+        scraper.transport.close()
+    row = result('listagem', {'itens': total}, seconds, pages, 'paginas')
+    row['itens_por_segundo'] = round(total / seconds, 2)
+    return row
+
+
+def bench_details(config, total, concurrency):
+    """
+    Fetch total certidões through the DetailFetcher into the response store.
+    """
+    from detail_fetcher import DetailFetcher
+    config.total = total
+    rows = [(id_valor, PECAS[peca_id_of(id_valor) - 1], peca_id_of(id_valor)) for id_valor in range(1, total + 1)]
+    with workdir():
+        scraper, stop = _scraper(concurrency)
+        start = time.perf_counter()
+        DetailFetcher(scraper.process_row, scraper.save_processed, concurrency).run(rows)
+        scraper.responses.flush()
+        seconds = time.perf_counter() - start
+        stop.set()
+        saved = len(scraper.responses)
+        scraper.responses.close()
+        scraper.transport.close()
+    return result('detalhes', {'itens': total, 'concorrencia': concurrency}, seconds, saved, 'detalhes')
+
+
+def _write_inputs(size, batch=50000):
+    """
+    Synthetic crawl output for size warrants: the response store and the
+    listing stage.
+    """
+    import pandas as pd
+    from response_store import ResponseStore, RESPONSES_DIR
+    from stage_io import StageWriter, OUTPUT_DIR
+
+    with ResponseStore(os.path.join(OUTPUT_DIR, RESPONSES_DIR), flush_records=batch) as store:
+        for id_valor in range(1, size + 1):
+            store.append({'id': id_valor, 'peca': PECAS[peca_id_of(id_valor) - 1], 'response': make_certidao(id_valor)})
+
+    with StageWriter('dados_gerais') as writer:
+        for first in range(1, size + 1, batch):
+            items = [make_listing_item(id_valor) for id_valor in range(first, min(first + batch, size + 1))]
+            df = pd.DataFrame(items).drop(columns=['dataExpedicao'])
+            df['orgaoExpeditor'] = df['orgaoExpeditor'].apply(json.dumps)
+            writer.write(df.astype({column: str for column in df.columns if column != 'id'}))
+
+
+def _write_geocoded(batch=200000):
+    # Coordenadas sintéticas no lugar da geocodificação (que depende de serviço externo)
+    from stage_io import StageWriter, iter_stage
+    with StageWriter('dados_geocodificados') as writer:
+        for chunk in iter_stage('dados_finais', batch):
+            writer.write(chunk.assign(lat=-23.5 + chunk['id'] % 100 / 1000, lng=-46.6 - chunk['id'] % 100 / 1000))
+
+
+def bench_postprocess(size):
+    """
+    Time the limpeza (postprocess.run, i.e. clear.py) and montagem
+    (address.run) stages over size synthetic records.
+    """
+    import address
+    import postprocess
+    rows = []
+    with workdir():
+        _write_inputs(size)
+
+        start = time.perf_counter()
+        rows_dados, _ = postprocess.run()
+        rows.append(result('limpeza', {'registros': size}, time.perf_counter() - start, rows_dados, 'linhas'))
+
+        _write_geocoded()
+        start = time.perf_counter()
+        address.run(incremental=False)
+        rows.append(result('montagem', {'registros': size}, time.perf_counter() - start, size, 'linhas'))
+    return rows
+
+
+def git_version():
+    try:
+        return subprocess.run(
+            ['git', 'describe', '--always', '--dirty'], cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _key(row):
+    return row['benchmark'], json.dumps(row['parametros'], sort_keys=True)
+
+
+def compare(results, baseline_path, tolerance=REGRESSION_TOLERANCE):
+    """
+    Print each benchmark's throughput against a previous results file and
+    return the ones that dropped by more than tolerance.
+    """
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = {_key(row): row for row in json.load(file)['resultados']}
+    regressions = []
+    for row in results:
+        base = baseline.get(_key(row))
+        if not base or not base.get('por_segundo') or row['por_segundo'] is None:
+            continue
+        ratio = row['por_segundo'] / base['por_segundo']
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(row)
+            flag = '  <-- regressão'
+        print(f"{row['benchmark']:<10} {json.dumps(row['parametros']):<40} {base['por_segundo']:>12} -> "
+              f"{row['por_segundo']:>12} ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do raspador e do pós-processamento contra um BNMP local.")
+    parser.add_argument('--apenas', nargs='*', choices=['listagem', 'detalhes', 'posprocessamento'],
+                        help="executa só estes grupos")
+    parser.add_argument('--itens-listagem', type=int, default=LISTING_TOTAL)
+    parser.add_argument('--itens-detalhes', type=int, default=DETAIL_TOTAL)
+    parser.add_argument('--concorrencias', type=int, nargs='*', default=CONCURRENCY_LEVELS)
+    parser.add_argument('--tamanhos', type=int, nargs='*', default=POSTPROCESS_SIZES)
+    parser.add_argument('--latencia', type=float, default=0.0, help="latência do servidor local, em segundos")
+    parser.add_argument('--variacao', type=float, default=0.0)
+    parser.add_argument('--erros', type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument('--nao-autorizado', type=float, default=0.0, help="fração de respostas 401")
+    parser.add_argument('--sem-excel', action='store_true', help="não exporta a etapa final para Excel")
+    parser.add_argument('--saida', help="arquivo JSON de resultados (padrão: benchmarks/results/<versão>-<data>.json)")
+    parser.add_argument('--comparar', metavar='BASE', help="compara com um arquivo de resultados anterior")
+    args = parser.parse_args(argv)
+    groups = set(args.apenas or ['listagem', 'detalhes', 'posprocessamento'])
+
+    if args.sem_excel:
+        import stage_io
+        stage_io.EXPORT_EXCEL = False
+
+    config = MockConfig(latency=args.latencia, jitter=args.variacao, error_rate=args.erros,
+                        unauthorized_rate=args.nao_autorizado)
+    results = []
+    with MockServer(config, port=int(os.environ['BNMP_BASE_URL'].rsplit(':', 1)[1])):
+        if 'listagem' in groups:
+            results.append(bench_listing(config, args.itens_listagem))
+        if 'detalhes' in groups:
+            for concurrency in args.concorrencias:
+                results.append(bench_details(config, args.itens_detalhes, concurrency))
+    if 'posprocessamento' in groups:
+        for size in args.tamanhos:
+            results.extend(bench_postprocess(size))
+
+    version = git_version()
+    report = {
+        'versao': version,
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'servidor': {'latencia': args.latencia, 'variacao': args.variacao, 'erros': args.erros,
+                     'nao_autorizado': args.nao_autorizado},
+        'resultados': results,
+    }
+    path = args.saida or os.path.join(
+        RESULTS_DIR, f"{version or 'sem-versao'}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    for row in results:
+        print(f"{row['benchmark']:<10} {json.dumps(row['parametros']):<40} {row['por_segundo']:>12}/s")
+    print(f"Resultados em {path}")
+
+    if args.comparar and compare(results, args.comparar):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
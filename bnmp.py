@@ -1,36 +1,42 @@
 import os
 import json
-import pandas as pd
 import requests
-from selenium.webdriver.common.keys import Keys
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.action_chains import ActionChains
-from selenium.common.exceptions import NoSuchElementException
-from openpyxl.workbook import Workbook
+from transport import BNMPTransport, MAX_RETRIES
+from rate_limit import AdaptiveRateLimiter, describe
+from detail_fetcher import (
+    DetailFetcher, DetailError, classify_status, iter_queue, END_OF_WORK,
+    TRANSIENT, SESSION, PERMANENT, DECODE,
+    DETAIL_CONCURRENCY, MAX_REQUESTS_PER_SECOND, DETAIL_QUEUE_SIZE,
+)
+from listing_writer import ListingAuditWriter
+from response_store import ResponseStore, RESPONSES_DIR
+from idset import IdSet
+from query_planner import QueryPlanner, PecaDimension, OrgaoDimension, load_orgaos, MAX_PAGE_DEPTH
+from stage_io import stage_path
+from checkpoint import CheckpointStore, result_outcome, CHECKPOINT_FILE
+from delta import FingerprintIndex, fingerprint, INCREMENTAL, FINGERPRINT_FILE
+from session import BrowserSession, SessionCoordinator, open_session, probe
+from metrics import METRICS, MetricsReporter, METRICS_FILE
 import time
-import random
-import subprocess 
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import queue
 
 OUTPUT_DIR = 'output'
-OUTPUT_FILE = 'output/1.dados_gerais.json'
-EXCEL_FILE = 'output/2.dados_gerais.xlsx'
-BNMP_URL = 'https://portalbnmp.cnj.jus.br/bnmpportal/api/pesquisa-pecas/filter'
+OUTPUT_FILE = '1.dados_gerais.json'
+# Estado pesquisado (id do portal; 25 = SP). O scheduler.py roda um por UF
+ID_ESTADO = 25
 MAX_ITEMS_PER_PAGE = 30
-RENEW_REQUEST_THRESHOLD = 40
-MAX_ITEMS_PER_PAGE = 30
-REFRESH_THRESHOLD = 40
-MAX_REQUESTS_BEFORE_PAUSE = 50
-RESPONSES_FILE = 'output/3.todas_respostas.json'
-
-HEADERS = {
-    'User-Agent': (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        "(KHTML, like Gecko) Chrome/86.0.4240.198 Safari/537.36"
-    )
-}
+# Segundos entre consultas de keep-alive da sessão
+KEEP_ALIVE_INTERVAL = 300
+# True volta ao comportamento antigo: um detalhe por vez, na thread principal
+SEQUENTIAL_DETAILS = False
+# Divide a listagem em subconsultas de até MAX_PAGE_DEPTH páginas (False = uma consulta só)
+PARTITION_QUERIES = True
+# Subconsultas da listagem paginadas ao mesmo tempo
+LISTING_CONCURRENCY = 4
+
 PECA_MAP = {
     "Mandado de Prisão": 1,
     "Contramandado": 2,
@@ -49,220 +55,327 @@ PECA_MAP = {
 }
 
 class BNMPScraper:
-    def __init__(self, cookies, driver):
-        self.cookies = cookies
-        self.params = {'page': '0', 'size': str(MAX_ITEMS_PER_PAGE), 'sort': ''}
-        self.json_data = {'buscaOrgaoRecursivo': False, 'orgaoExpeditor': {}, 'idEstado': 25}
-        self.driver = driver
+    def __init__(self, cookies, browser, transport=None, concurrency=DETAIL_CONCURRENCY, sequential=SEQUENTIAL_DETAILS,
+                 checkpoint=None, incremental=INCREMENTAL, output_dir=OUTPUT_DIR, id_estado=ID_ESTADO):
+        self.transport = transport or BNMPTransport(rate_limiter=AdaptiveRateLimiter(MAX_REQUESTS_PER_SECOND))
+        self.transport.set_cookies(cookies)
+        self.concurrency = 1 if sequential else concurrency
+        self.session = SessionCoordinator(self.transport, browser)
+        # Cada estado (shard) grava em seu próprio diretório, com seu checkpoint
+        self.output_dir = output_dir
+        self.output_file = os.path.join(output_dir, OUTPUT_FILE)
+        self.listing_dir = stage_path('dados_gerais', output_dir)
+        self.responses = ResponseStore(os.path.join(output_dir, RESPONSES_DIR), on_flush=self.commit_results)
+        self.checkpoint = checkpoint or CheckpointStore(os.path.join(output_dir, os.path.basename(CHECKPOINT_FILE)))
+        self.incremental = incremental
+        self.fingerprints = FingerprintIndex(os.path.join(output_dir, os.path.basename(FINGERPRINT_FILE)))
+        self.pending_fingerprints = {}
+        # Ids já listados nesta execução: subconsultas sobrepostas não repetem itens
+        self.listed_ids = IdSet()
+        self.listing_complete = False
+        # Exceção da thread da listagem, relançada por scrape() depois que os detalhes terminam
+        self.listing_error = None
+        self.id_estado = id_estado
+        self.json_data = {'buscaOrgaoRecursivo': False, 'orgaoExpeditor': {}, 'idEstado': id_estado}
         self.processed_ids_count = 0
-        self.request_count = 0
+        self.last_keep_alive = time.monotonic()
 
-    def make_request(self):
+    def make_request(self, params, json_data):
         try:
-            response = requests.post(
-                BNMP_URL,
-                params=self.params,
-                cookies=self.cookies,
-                headers=HEADERS,
-                json=self.json_data,
-            )
-            response.raise_for_status()
+            # 401 renova a sessão e 429/5xx esperam antes de repetir a página
+            response = self.session.request(lambda: self.transport.post_filter(params, json_data))
+            if response.status_code != 401:
+                response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
             print(f"Error making request: {e}")
             return None
 
     def scrape(self):
-        page = 0
-        page_count = 0
-        all_data = []
-        consecutive_401_count = 0
+        """
+        List and fetch the configured state, resuming from the checkpoint.
+        Returns True when the listing went to the end; a failure inside the
+        listing thread is re-raised.
+        """
+        # Execução anterior concluída: esta começa do zero (ou só com o delta, se incremental)
+        if self.checkpoint.is_complete():
+            self.checkpoint.reset()
+        # Retoma de onde a execução anterior parou (apague o checkpoint para recomeçar);
+        # o ResponseStore já descartou os blocos não confirmados ao ser aberto
+        if self.checkpoint.is_fresh():
+            self.responses.clear()
+
+        # A listagem alimenta a fila enquanto os detalhes já vão sendo buscados
+        work_queue = queue.Queue(maxsize=DETAIL_QUEUE_SIZE)
+        fetcher = DetailFetcher(self.process_row, self.save_processed, self.concurrency)
+        METRICS.gauge('bnmp_queue_depth', work_queue.qsize, queue='detalhes')
+        METRICS.gauge('bnmp_queue_depth', lambda: len(fetcher.retries), queue='retentativas')
+        METRICS.gauge('bnmp_session_valid', lambda: int(self.session.valid))
+        if self.transport.rate_limiter is not None:
+            METRICS.gauge('bnmp_rate_limit', lambda: self.transport.rate_limiter.rate)
+        # Arquivo .prom e linha de progresso periódicos no lugar dos prints por requisição
+        reporter = MetricsReporter(
+            os.path.join(self.output_dir, METRICS_FILE), extra=lambda: describe(self.transport.rate_limiter)
+        ).start()
+
+        producer = threading.Thread(target=self.produce_listing, args=(work_queue,), daemon=True)
+        producer.start()
+        try:
+            fetcher.run(iter_queue(work_queue))
+            producer.join()
+            self.responses.flush()
+        finally:
+            reporter.stop()
+        # A listagem falhou: os detalhes já buscados ficam no checkpoint, mas a execução não terminou
+        if self.listing_error is not None:
+            raise self.listing_error
+
+        # Execução completa: fica marcada até a próxima começar (o scheduler pula shards concluídos)
+        if self.listing_complete:
+            self.checkpoint.mark_complete()
+        return self.listing_complete
+
+    def iter_plan(self):
+        """
+        Yield the listing sub-queries as (body, total) while they are planned.
+        The plan is made once per run and kept in the checkpoint, so a resumed
+        run crawls the same partition.
+        """
+        plan = self.checkpoint.get_meta('plano')
+        if plan is not None:
+            yield from ((body, total) for body, total in plan)
+            return
+
+        if not PARTITION_QUERIES:
+            plan = [(self.json_data, None)]
+            yield from plan
+        else:
+            dimensions = [PecaDimension(PECA_MAP.values()), OrgaoDimension(lambda: load_orgaos(self.id_estado, session=self.session))]
+            planner = QueryPlanner(self.session, dimensions, MAX_PAGE_DEPTH * MAX_ITEMS_PER_PAGE)
+            plan = []
+            for leaf in planner.iter_plan(self.json_data):
+                plan.append(leaf)
+                yield leaf
+        self.checkpoint.set_meta('plano', plan)
+
+    def produce_listing(self, work_queue):
+        try:
+            resume_offset = self.checkpoint.get_offset(self.output_file)
+            with ListingAuditWriter(self.output_file, self.listing_dir, resume_offset) as writer:
+                # Itens listados antes da queda que ainda não tiveram o detalhe buscado
+                for item in writer.iter_previous_items():
+                    self.listed_ids.add(item['id'])
+                    self.enqueue(work_queue, [item])
+                # Cada subconsulta é listada assim que planejada, sem esperar o plano inteiro
+                planned, bounded, futures = 0, True, []
+                already_done = len(self.checkpoint.done_ids)
+                with ThreadPoolExecutor(max_workers=LISTING_CONCURRENCY) as executor:
+                    for body, total in self.iter_plan():
+                        futures.append(executor.submit(self.crawl_query, body, total, writer, work_queue))
+                        if total is None:
+                            bounded = False
+                            continue
+                        # Detalhes que esta execução ainda deve buscar, para o ETA
+                        planned += total
+                        METRICS.set('bnmp_itens_previstos', max(0, planned - already_done))
+                    done = [future.result() for future in futures]
+
+                if bounded and writer.count != planned:
+                    print(f"Aviso: {writer.count} itens listados, mas as subconsultas somavam {planned}.")
+                self.listing_complete = all(done)
+        except Exception as e:
+            self.listing_error = e
+        finally:
+            work_queue.put(END_OF_WORK)
+
+    def crawl_query(self, body, total, writer, work_queue):
+        """
+        Page through one sub-query from its checkpointed cursor. Returns True
+        once the sub-query has been listed to the end.
+        """
+        query_key = self.checkpoint.query_key(body)
+        start_page, listing_done = self.checkpoint.get_cursor(query_key)
+        if listing_done:
+            return True
+        if start_page:
+            print(f"Retomando a subconsulta {query_key} na página {start_page}")
+
+        # Uma página de folga para itens expedidos durante a raspagem
+        max_pages = None if total is None else math.ceil(total / MAX_ITEMS_PER_PAGE) + 1
+        if max_pages is None or max_pages > MAX_PAGE_DEPTH:
+            print(f"Aviso: a subconsulta {query_key} ({'total desconhecido' if total is None else f'{total} itens'}) "
+                  f"será paginada além de {MAX_PAGE_DEPTH} páginas; itens podem faltar se o portal limitar a profundidade.")
+        for page, items in self.iter_pages(body, start_page, max_pages):
+            # No limite de profundidade a subconsulta é dada como encerrada (iter_pages avisa)
+            listing_done = len(items) < MAX_ITEMS_PER_PAGE or page + 1 == max_pages
+            METRICS.inc('bnmp_listing_pages_total')
+            items = [item for item in items if self.listed_ids.add(item['id'])]
+            METRICS.inc('bnmp_listing_items_total', len(items))
+            with writer.lock:
+                writer.write_page(items)
+                self.checkpoint.set_cursor(
+                    query_key, page + 1, done=listing_done,
+                    path=self.output_file, offset=writer.offset,
+                )
+            self.enqueue(work_queue, items)
+        return listing_done
+
+    def enqueue(self, work_queue, items):
+        for item in items:
+            if self.checkpoint.is_done(item['id']):
+                continue
+            fp = fingerprint(item)
+            if self.incremental and not self.fingerprints.is_changed(item, fp):
+                continue
+            self.pending_fingerprints[item['id']] = fp
+            descricao_peca = item.get('descricaoPeca')
+            work_queue.put((item['id'], descricao_peca, PECA_MAP.get(descricao_peca)))
+
+    def iter_pages(self, json_data, page=0, max_pages=None):
+        params = {'page': str(page), 'size': str(MAX_ITEMS_PER_PAGE), 'sort': ''}
 
         while True:
-            self.params['page'] = str(page)
-            response = self.make_request()
-            if not response:
+            if max_pages is not None and page >= max_pages:
+                print(f"Aviso: limite de {max_pages} páginas atingido na subconsulta {json.dumps(json_data, ensure_ascii=False)}")
+                break
+            params['page'] = str(page)
+            response = self.make_request(params, json_data)
+            if response is None:
                 break
 
             if response.status_code == 401:
-                consecutive_401_count += 1
-                if consecutive_401_count >= 5:
-                    print("Blocked by server. Exiting scraping process.")
-                    break
-            else:
-                consecutive_401_count = 0
+                print("Blocked by server. Exiting scraping process.")
+                break
 
             if response.status_code != 200:
                 print(f"Unexpected status code: {response.status_code}. Exiting scraping process.")
                 break
 
             items = response.json().get('content', [])
-            all_data.extend(items)
+            yield page, items
             page += 1
-            page_count += 1
-
-            if page_count == RENEW_REQUEST_THRESHOLD:
-                page_count = 0
-                print("Renewing request...")
-                self.driver.refresh()
-
-            print(f"Successfully processed page {page}")
+            self.keep_alive()
 
             if len(items) < MAX_ITEMS_PER_PAGE:
                 break
-            if self.processed_ids_count >= 30:
-                print("Limite de 30 entradas atingido. Encerrando o processo de scraping.")
-                break
-        self.save_json(all_data)
-        self.save_excel(all_data)
-        df = pd.read_excel(EXCEL_FILE)
-        df['peca_id'] = df['descricaoPeca'].map(PECA_MAP)
-
-        for idx, row in df.iterrows():
-
-
-            id_valor = row['id']
-            descricao_peca = row['descricaoPeca']
-            peca_id = row['peca_id']
-
-            if peca_id:
-                response = self.fetch_data_by_id_and_peca(id_valor, peca_id)
-                result = {
-                    "id": id_valor,
-                    "peca": descricao_peca,
-                    "response": response
-                }
-            else:
-                result = {
-                    "id": id_valor,
-                    "peca": descricao_peca,
-                    "error": f"Peça '{descricao_peca}' não encontrada no dicionário de peças."
-                }
-            self.save_response(result)
-
-            self.processed_ids_count += 1
-            self.request_count += 1
-
-            
-            if self.request_count % MAX_REQUESTS_BEFORE_PAUSE == 0:
-                print(f"Pausando após {self.request_count} requisições...")
-
-            if self.processed_ids_count % REFRESH_THRESHOLD == 0:
-                self.refresh_browser()
-
-    def fetch_data_by_id_and_peca(self, id_valor, peca_id):
-        html_url = f'https://portalbnmp.cnj.jus.br/#/resumo-peca/{id_valor}/{peca_id}/%2Fpesquisa-peca'
-        json_url = f'https://portalbnmp.cnj.jus.br/bnmpportal/api/certidaos/{id_valor}/{peca_id}'
 
-        max_retries = 5
-        backoff_factor = 2
+    def process_row(self, id_valor, descricao_peca, peca_id):
+        try:
+            if peca_id is None:
+                raise DetailError(PERMANENT, f"Peça '{descricao_peca}' não encontrada no dicionário de peças.")
+            response = self.fetch_data_by_id_and_peca(id_valor, int(peca_id))
+        except DetailError as e:
+            return {
+                "id": id_valor,
+                "peca": descricao_peca,
+                "error": e.mensagem,
+                "categoria": e.categoria,
+                "status": e.status,
+            }
+        return {
+            "id": id_valor,
+            "peca": descricao_peca,
+            "response": response
+        }
+
+    def save_processed(self, result, attempts=1):
+        if 'error' in result:
+            result['tentativas'] = attempts
+        self.responses.append(result)
+        self.processed_ids_count += 1
+        METRICS.inc('bnmp_details_total', resultado=result_outcome(result))
+        self.keep_alive()
+
+    def commit_results(self, results):
+        # Chamado pelo ResponseStore quando o bloco já está gravado em disco
+        outcomes = [(result['id'], result_outcome(result)) for result in results]
+        self.checkpoint.mark_done_many(outcomes)
+
+        # Só o que foi buscado com sucesso fica pendente no índice; erros voltam no próximo delta.
+        # As pendências valem só depois que o snapshot absorver o delta (address.run)
+        for id_valor, outcome in outcomes:
+            fp = self.pending_fingerprints.pop(id_valor, None)
+            if fp and outcome == 'ok':
+                self.fingerprints.stage(id_valor, fp)
 
-        for attempt in range(max_retries):
+    def fetch_data_by_id_and_peca(self, id_valor, peca_id):
+        """
+        Return the certidão JSON or raise DetailError. Transient failures are
+        not retried here: the DetailFetcher requeues them with a delay.
+        """
+        # Um 401 não gasta tentativa: o worker só espera a sessão ser renovada
+        for _ in range(MAX_RETRIES):
+            generation = self.session.wait()
             try:
-                html_response = requests.get(html_url, cookies=self.cookies, headers=HEADERS)
-                html_status_code = html_response.status_code
-                print(f"Requisição HTML para o ID {id_valor}, Peça ID {peca_id} feita... Status {html_status_code}")
-
-                if html_status_code == 200:
-                    json_response = requests.get(json_url, cookies=self.cookies, headers=HEADERS)
-                    json_status_code = json_response.status_code
-                    print(f"Requisição JSON para o ID {id_valor}, Peça ID {peca_id} feita... Status {json_status_code}")
-
-                    if json_status_code == 200:
-                        try:
-                            return json_response.json()
-                        except json.JSONDecodeError:
-                            return {"error": f"Erro ao decodificar JSON para o ID {id_valor}, Peça ID {peca_id}. Resposta: {json_response.text}"}
-                    elif json_status_code == 401:
-                        self.handle_captcha()
+                if not self.transport.direct_api:
+                    html_response = self.transport.get_resumo_html(id_valor, peca_id)
+                    html_status_code = html_response.status_code
+
+                    if html_status_code == 401:
+                        self.session.invalidate(generation)
                         continue
-                    else:
-                        return {"error": f"Erro ao obter dados JSON para o ID {id_valor}, Peça ID {peca_id}: Status {json_status_code}"}
-                elif html_status_code == 401:
-                    self.handle_captcha()
+                    elif html_status_code != 200:
+                        raise DetailError(classify_status(html_status_code), "Erro ao obter HTML", html_status_code)
+
+                json_response = self.transport.get_certidao(id_valor, peca_id)
+                json_status_code = json_response.status_code
+
+                if json_status_code == 200:
+                    try:
+                        return json_response.json()
+                    except json.JSONDecodeError:
+                        raise DetailError(DECODE, "Resposta não é JSON válido", json_status_code)
+                elif json_status_code == 401:
+                    self.session.invalidate(generation)
                     continue
                 else:
-                    return {"error": f"Erro ao obter HTML para o ID {id_valor}, Peça ID {peca_id}: Status {html_status_code}"}
+                    raise DetailError(classify_status(json_status_code), "Erro ao obter dados JSON", json_status_code)
             except requests.RequestException as e:
-                print(f"Tentativa {attempt + 1} falhou: {e}. Retentando em {backoff_factor ** attempt} segundos.")
-                time.sleep(backoff_factor ** attempt)
-
-        return {"error": f"Falha ao obter dados para o ID {id_valor}, Peça ID {peca_id} após {max_retries} tentativas."}
-
-    def refresh_browser(self):
-        url = 'https://portalbnmp.cnj.jus.br/'
-        self.driver.get(url)
-        time.sleep(10)  # Esperar 10 segundos para garantir que a página carregue
-
-    def handle_captcha(self):
-        self.driver.get("https://portalbnmp.cnj.jus.br/#/captcha/")
-        input("Por favor, resolva o CAPTCHA e pressione Enter para continuar...")
-        self.cookies = {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
-
-    def save_response(self, result):
-        with open(RESPONSES_FILE, 'a', encoding='utf-8') as file:
-            json.dump(result, file, ensure_ascii=False)
-            file.write('\n')
-
-    def save_json(self, data):
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
-  
-    @staticmethod
-    def save_excel(data):
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        df = pd.DataFrame(data).drop(columns=['dataExpedicao', 'dataNascimento'], errors='ignore')
-        df.to_excel(EXCEL_FILE, index=False)
-        print(f"Arquivo '{EXCEL_FILE}' criado com sucesso.")
-
-if __name__ == "__main__":
-    #chrome_driver_path = "/usr/bin/chromedriver"para linux
-    chrome_driver_path = "C:\webdriver\chromedriver.exe"
+                raise DetailError(TRANSIENT, f"{type(e).__name__}: {e}")
 
-    chrome_options = Options()
-    service = Service(chrome_driver_path)
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-
-    driver.get("https://portalbnmp.cnj.jus.br/#/captcha/")
-
-    input("Press Enter after you have solved the CAPTCHA manually...")
-
-    cookies = driver.get_cookies()
-    cookies_dict = {cookie['name']: cookie['value'] for cookie in cookies}
-
-    scraper = BNMPScraper(cookies_dict, driver)
-    scraper.scrape()
-
-    driver.quit()
-
-    # Executar o script de limpeza após a raspagem
-    print("Executando analise de erros...")
-    subprocess.run(["python", "error_check.py"])
-
-    print('Processo Finalizado')
-    
-    driver.quit()
-
- # Executar o script de limpeza após a raspagem
-print("Extraindo o Json dos arquivos com erros..")
-subprocess.run(["python", "error_check_json.py"])
-
-print('Limpeza dos Erros Feita com sucesso...')
-
-print("Mesclando Json")
-subprocess.run(["python", "mescla_json.py"])
-
-print('Json Mesclado com sucesso!')
-
-
-print("Ajustando o dataset para usar no api maps..")
-subprocess.run(["python", "clear.py"])
-
-print('Processo Finalizado')
+        raise DetailError(SESSION, f"Sessão recusada após {MAX_RETRIES} renovações", 401)
 
+    def keep_alive(self):
+        # Uma consulta de um item mantém a sessão, sem recarregar a página no navegador
+        if time.monotonic() - self.last_keep_alive < KEEP_ALIVE_INTERVAL:
+            return
+        self.last_keep_alive = time.monotonic()
+        generation = self.session.generation
+        try:
+            # 429/5xx no teste (None) não dizem nada sobre a sessão; só o 401 a invalida
+            if probe(self.transport) is False:
+                self.session.invalidate(generation)
+        except requests.RequestException as e:
+            print(f"Falha no keep-alive da sessão: {e}")
+
+
+def run_postprocessing():
+    # Limpeza, geocodificação e montagem no mesmo processo, pulando o que não mudou
+    from pipeline import run
+    run()
+
+
+def main():
+    """
+    Crawl the configured state, opening the browser only if the saved
+    session has expired. Returns True when the listing went to the end.
+    """
+    browser = BrowserSession()
+    transport = BNMPTransport(rate_limiter=AdaptiveRateLimiter(MAX_REQUESTS_PER_SECOND))
+    cookies_dict = open_session(transport, browser)
+
+    scraper = BNMPScraper(cookies_dict, browser, transport)
+    try:
+        complete = scraper.scrape()
+    finally:
+        scraper.responses.close()
+        scraper.transport.close()
+        browser.quit()
+    if not complete:
+        print("Listagem incompleta: rode novamente para retomar do checkpoint; pós-processamento não executado.")
+    return complete
 
-print("Gerando lat e Long..")
-subprocess.run(["python", "address.py"])
 
-print('Coluna, Lat e Long criada e arquivo final disponível.')
\ No newline at end of file
+if __name__ == "__main__":
+    if main():
+        run_postprocessing()
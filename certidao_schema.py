@@ -0,0 +1,85 @@
+from typing import List, Optional, Union
+import msgspec
+
+# Apenas os campos da certidão que o pós-processamento usa; o decodificador
+# pula todo o resto sem criar objetos Python para ele. Listas podem vir null
+# e números como float: o tipo aceita o que o portal manda e o pós-processamento
+# normaliza (listas null como vazias, 12.0 como '12')
+
+
+class Estado(msgspec.Struct):
+    sigla: Optional[str] = None
+
+
+class Municipio(msgspec.Struct):
+    nome: Optional[str] = None
+
+
+class Endereco(msgspec.Struct):
+    logradouro: Optional[str] = None
+    numero: Union[str, int, float, None] = None
+    bairro: Optional[str] = None
+    municipio: Optional[Municipio] = None
+    estado: Optional[Estado] = None
+
+
+class TipoDocumento(msgspec.Struct):
+    descricao: Optional[str] = None
+
+
+class Documento(msgspec.Struct):
+    tipoDocumento: Optional[TipoDocumento] = None
+    numero: Union[str, int, float, None] = None
+
+
+class Pessoa(msgspec.Struct):
+    enderecos: Optional[List[Endereco]] = None
+    documento: Optional[List[Documento]] = None
+
+
+class Tipificacao(msgspec.Struct):
+    rotulo: Optional[str] = None
+
+
+class Certidao(msgspec.Struct):
+    pessoa: Optional[Pessoa] = None
+    tipificacaoPenal: Optional[List[Tipificacao]] = None
+    error: Optional[str] = None
+
+
+class RespostaSalva(msgspec.Struct):
+    """
+    One line of 3.todas_respostas.json. Failed details carry the failure
+    category, HTTP status and attempt count next to the message.
+    """
+    id: Union[int, str, None] = None
+    peca: Optional[str] = None
+    response: Optional[Certidao] = None
+    error: Optional[str] = None
+    categoria: Optional[str] = None
+    status: Optional[int] = None
+    tentativas: Optional[int] = None
+
+
+class _SoId(msgspec.Struct):
+    id: Union[int, str, None] = None
+    peca: Optional[str] = None
+
+
+_decoder = msgspec.json.Decoder(RespostaSalva)
+_id_decoder = msgspec.json.Decoder(_SoId)
+
+
+def decode_line(line):
+    """
+    Decode one saved line. A line with the wrong shape is returned as an
+    error record (keeping its id and peca when they can be read) instead of raising.
+    """
+    try:
+        return _decoder.decode(line)
+    except (msgspec.DecodeError, msgspec.ValidationError) as e:
+        try:
+            chave = _id_decoder.decode(line)
+        except (msgspec.DecodeError, msgspec.ValidationError):
+            chave = _SoId()
+        return RespostaSalva(id=chave.id, peca=chave.peca, error=f"Registro inválido: {e}")
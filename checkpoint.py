@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import threading
+from idset import IdSet
+
+CHECKPOINT_FILE = 'output/checkpoint.sqlite'
+
+
+def result_outcome(result):
+    """
+    Classify a saved detail line as 'ok' or by its failure category
+    ('error' for lines without one).
+    """
+    response = result.get('response')
+    if 'error' in result or (isinstance(response, dict) and 'error' in response):
+        return result.get('categoria') or 'error'
+    return 'ok'
+
+
+class CheckpointStore:
+    def __init__(self, path=CHECKPOINT_FILE):
+        """
+        Durable crawl state: listing cursor per query, fetched ids with their
+        outcome, the committed size of every output file and run metadata
+        (e.g. the query plan).
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS cursors (
+                query_key TEXT PRIMARY KEY,
+                page INTEGER NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS fetched (
+                id TEXT PRIMARY KEY,
+                outcome TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS offsets (
+                path TEXT PRIMARY KEY,
+                offset INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+        # Carregado uma vez: consultas de "já buscado?" ficam O(1) em memória (bitmap compacto)
+        self.done_ids = IdSet(row[0] for row in self.conn.execute('SELECT id FROM fetched'))
+
+    @staticmethod
+    def query_key(json_data):
+        return json.dumps(json_data, sort_keys=True, ensure_ascii=False)
+
+    def get_cursor(self, query_key):
+        """
+        Return (next_page, done) for a listing query; (0, False) if never seen.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT page, done FROM cursors WHERE query_key = ?', (query_key,)
+            ).fetchone()
+        return (row[0], bool(row[1])) if row else (0, False)
+
+    def set_cursor(self, query_key, page, done=False, path=None, offset=None):
+        """
+        Record the next listing page, together with the audit file size if given.
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO cursors (query_key, page, done) VALUES (?, ?, ?)',
+                (query_key, page, int(done)),
+            )
+            if path is not None:
+                self._set_offset(path, offset)
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                (key, json.dumps(value, ensure_ascii=False)),
+            )
+
+    def is_done(self, id_valor):
+        return str(id_valor) in self.done_ids
+
+    def mark_done_many(self, outcomes):
+        """
+        Record several (id, outcome) pairs in one transaction.
+        """
+        outcomes = [(str(id_valor), outcome) for id_valor, outcome in outcomes]
+        with self._lock, self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO fetched (id, outcome) VALUES (?, ?)', outcomes)
+            self.done_ids.update(id_valor for id_valor, _ in outcomes)
+
+    def get_offset(self, path):
+        with self._lock:
+            row = self.conn.execute('SELECT offset FROM offsets WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else None
+
+    def _set_offset(self, path, offset):
+        self.conn.execute(
+            'INSERT OR REPLACE INTO offsets (path, offset) VALUES (?, ?)', (path, offset)
+        )
+
+    def is_fresh(self):
+        """
+        True when no run is in progress (nothing listed or fetched yet).
+        """
+        with self._lock:
+            listed = self.conn.execute('SELECT 1 FROM cursors LIMIT 1').fetchone()
+            planned = self.conn.execute('SELECT 1 FROM meta LIMIT 1').fetchone()
+        return not listed and not planned and not self.done_ids
+
+    def mark_complete(self):
+        """
+        Record that the run listed and fetched everything. The checkpoint is
+        kept (a multi-state crawl skips finished shards on a rerun) until
+        reset() or the next scrape() starts over.
+        """
+        self.set_meta('concluido', True)
+
+    def is_complete(self):
+        return bool(self.get_meta('concluido'))
+
+    def reset(self):
+        """
+        Forget a finished run so the next one starts from scratch.
+        """
+        with self._lock, self.conn:
+            self.conn.execute('DELETE FROM cursors')
+            self.conn.execute('DELETE FROM fetched')
+            self.conn.execute('DELETE FROM offsets')
+            self.conn.execute('DELETE FROM meta')
+            self.done_ids.clear()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,142 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+FINGERPRINT_FILE = 'output/indice_fingerprints.sqlite'
+SNAPSHOT_DIR = 'output/snapshot'
+
+# True busca apenas os mandados novos ou alterados desde a última execução
+INCREMENTAL = False
+
+# Campos da listagem que, se mudarem, exigem buscar o detalhe de novo
+FINGERPRINT_FIELDS = ('descricaoPeca', 'dataExpedicao', 'descricaoStatus', 'status', 'numeroPeca')
+
+
+def fingerprint(item):
+    values = [item.get(field) for field in FINGERPRINT_FIELDS]
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+class FingerprintIndex:
+    def __init__(self, path=FINGERPRINT_FILE):
+        """
+        Fingerprint of every listing item whose detail reached the snapshot,
+        keyed by id, kept across runs. Fingerprints of freshly fetched details
+        are staged apart and only promoted once the snapshot has merged them,
+        so a run whose post-processing fails fetches them again.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS items (id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS pendentes (id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL);'
+        )
+        self.conn.commit()
+        self.known = dict(self.conn.execute('SELECT id, fingerprint FROM items'))
+
+    def is_changed(self, item, fp=None):
+        """
+        True when the item is new or any fingerprinted field differs.
+        """
+        return self.known.get(str(item['id'])) != (fp or fingerprint(item))
+
+    def stage(self, id_valor, fp):
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO pendentes (id, fingerprint) VALUES (?, ?)', (str(id_valor), fp))
+
+    def promote(self):
+        """
+        Move the staged fingerprints into the index; returns how many.
+        """
+        with self._lock, self.conn:
+            promoted = self.conn.execute('INSERT OR REPLACE INTO items SELECT id, fingerprint FROM pendentes').rowcount
+            self.conn.execute('DELETE FROM pendentes')
+            self.known = dict(self.conn.execute('SELECT id, fingerprint FROM items'))
+        return promoted
+
+    def close(self):
+        self.conn.close()
+
+
+def promote_fingerprints(path=FINGERPRINT_FILE):
+    """
+    Promote the staged fingerprints of every index under the output
+    directory (the national one and each state's), once the snapshot holds
+    the details they describe.
+    """
+    pattern = os.path.join(os.path.dirname(path) or '.', '**', os.path.basename(path))
+    for index_path in glob.glob(pattern, recursive=True):
+        index = FingerprintIndex(index_path)
+        try:
+            index.promote()
+        finally:
+            index.close()
+
+
+# Linhas lidas por vez do snapshot anterior e do delta
+MERGE_BATCH = 100000
+
+
+def _stage_files(path):
+    return sorted(glob.glob(os.path.join(path, '*.parquet'))) if os.path.isdir(path) else [path]
+
+
+def _conform(batch, schema):
+    columns = [
+        batch.column(field.name).cast(field.type) if field.name in batch.schema.names
+        else pa.nulls(batch.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def merge_snapshot(path, name, key='id', snapshot_dir=SNAPSHOT_DIR):
+    """
+    Merge the stage file written by an incremental run into the previous
+    snapshot of the same stage (delta rows win) and return the snapshot
+    path. Streams both files in batches: only the delta's keys are held
+    in memory, the previous rows they replace are dropped on the way (an
+    anti-join) and the delta rows are appended after them.
+    """
+    snapshot_path = os.path.join(snapshot_dir, f'{name}.parquet')
+    delta_files = _stage_files(path)
+    schema = pa.unify_schemas(
+        [pq.read_schema(file) for file in delta_files] + [pq.read_schema(snapshot_path)], promote_options='permissive'
+    ).remove_metadata()
+    delta_keys = pa.concat_arrays([
+        chunk for file in delta_files for chunk in pq.read_table(file, columns=[key]).column(key).chunks
+    ] or [pa.array([], schema.field(key).type)]).cast(schema.field(key).type)
+
+    tmp_path = f'{snapshot_path}.tmp'
+    with pq.ParquetWriter(tmp_path, schema) as writer:
+        for batch in pq.ParquetFile(snapshot_path).iter_batches(batch_size=MERGE_BATCH):
+            table = _conform(batch, schema)
+            writer.write_table(table.filter(pc.invert(pc.is_in(table.column(key), value_set=delta_keys))))
+        for file in delta_files:
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=MERGE_BATCH):
+                writer.write_table(_conform(batch, schema))
+    os.replace(tmp_path, snapshot_path)
+    return snapshot_path
+
+
+def snapshot_file(path, name, key='id', incremental=INCREMENTAL, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Update the snapshot of a stage file and return its path: an incremental
+    run merges its delta into it (merge_snapshot), a full run copies the
+    file over it without loading it.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    snapshot_path = os.path.join(snapshot_dir, f'{name}.parquet')
+    if incremental and os.path.exists(snapshot_path):
+        return merge_snapshot(path, name, key, snapshot_dir)
+    shutil.copyfile(path, snapshot_path)
+    return snapshot_path
@@ -0,0 +1,178 @@
+import heapq
+import itertools
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from metrics import METRICS
+
+# Número de requisições de detalhe em andamento ao mesmo tempo
+DETAIL_CONCURRENCY = 8
+# Taxa inicial de requisições por segundo (todas as threads somadas);
+# o AdaptiveRateLimiter a ajusta conforme as respostas do portal
+MAX_REQUESTS_PER_SECOND = 10
+# Itens da listagem aguardando detalhe; limita a memória do pipeline
+DETAIL_QUEUE_SIZE = 1000
+
+# Marca o fim da fila de trabalho
+END_OF_WORK = object()
+# Devolvido por iter_queue quando a listagem demora: o fetcher aproveita para
+# salvar os detalhes concluídos e disparar as novas tentativas já vencidas
+IDLE = object()
+# Espera máxima, em segundos, por uma linha da listagem antes de devolver IDLE
+QUEUE_POLL = 0.2
+
+# Tentativas de um detalhe com falha passageira dentro da mesma execução
+MAX_ATTEMPTS = 4
+# Espera antes da primeira nova tentativa; dobra a cada tentativa
+RETRY_DELAY = 5
+
+# Categorias de falha de um detalhe
+TRANSIENT = 'transitoria'      # rede, timeout, 429 e 5xx
+SESSION = 'sessao'             # 401 persistente mesmo após renovar a sessão
+PERMANENT = 'permanente'       # 404 e demais 4xx, peça desconhecida
+DECODE = 'decodificacao'       # 200 com corpo que não é JSON
+RETRYABLE = (TRANSIENT, SESSION)
+
+
+class DetailError(Exception):
+    def __init__(self, categoria, mensagem, status=None):
+        """
+        A detail that could not be fetched, with its failure category and the
+        HTTP status when there was one.
+        """
+        super().__init__(mensagem)
+        self.categoria = categoria
+        self.mensagem = mensagem
+        self.status = status
+
+
+def classify_status(status):
+    if status == 401:
+        return SESSION
+    if status == 429 or status >= 500:
+        return TRANSIENT
+    return PERMANENT
+
+
+def is_retryable(result):
+    return result.get('categoria') in RETRYABLE
+
+
+def iter_queue(work_queue, poll=QUEUE_POLL):
+    """
+    Yield rows from a work queue until the producer puts END_OF_WORK, and
+    IDLE whenever no row arrives within poll seconds.
+    """
+    while True:
+        try:
+            row = work_queue.get(timeout=poll)
+        except queue.Empty:
+            yield IDLE
+            continue
+        if row is END_OF_WORK:
+            return
+        yield row
+
+
+class RetryQueue:
+    def __init__(self):
+        """
+        Rows waiting for another attempt, ordered by the time they are due.
+        """
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, row, attempt, delay):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), row, attempt))
+
+    def pop_ready(self):
+        """
+        Return (row, attempt) for the first due row, or None.
+        """
+        if self._heap and self._heap[0][0] <= time.monotonic():
+            _, _, row, attempt = heapq.heappop(self._heap)
+            return row, attempt
+        return None
+
+    def next_delay(self):
+        return max(0, self._heap[0][0] - time.monotonic()) if self._heap else None
+
+
+class DetailFetcher:
+    def __init__(self, process_row, save_result, concurrency=DETAIL_CONCURRENCY, max_attempts=MAX_ATTEMPTS):
+        """
+        Run process_row over the detail rows on a thread pool.
+        save_result(result, attempts) is always called from the calling thread,
+        one result at a time, so the NDJSON output keeps exactly one line per id.
+        Results with a retryable failure go back to a delayed retry queue, which
+        takes priority over fresh rows once due, until max_attempts. Rows may
+        include IDLE, on which finished results and due retries are handled
+        without waiting for the next row.
+        """
+        self.process_row = process_row
+        self.save_result = save_result
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retries = RetryQueue()
+
+    def run(self, rows):
+        if self.concurrency <= 1:
+            self._run_sequential(rows)
+            return
+
+        # Janela limitada: no máximo 2x a concorrência em memória
+        max_pending = self.concurrency * 2
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            def submit(row, attempt):
+                while len(pending) >= max_pending:
+                    self._drain(pending)
+                pending[executor.submit(self.process_row, *row)] = (row, attempt)
+
+            for row in rows:
+                while (ready := self.retries.pop_ready()) is not None:
+                    submit(*ready)
+                if pending:
+                    self._drain(pending, timeout=0)
+                if row is not IDLE:
+                    submit(row, 1)
+
+            while pending or self.retries:
+                ready = self.retries.pop_ready()
+                if ready is not None:
+                    submit(*ready)
+                elif pending:
+                    self._drain(pending, timeout=self.retries.next_delay())
+                else:
+                    time.sleep(self.retries.next_delay())
+
+    def _run_sequential(self, rows):
+        def run_ready():
+            while (ready := self.retries.pop_ready()) is not None:
+                row, attempt = ready
+                self._finish(row, attempt, self.process_row(*row))
+
+        for row in rows:
+            run_ready()
+            if row is not IDLE:
+                self._finish(row, 1, self.process_row(*row))
+        while self.retries:
+            time.sleep(self.retries.next_delay())
+            run_ready()
+
+    def _drain(self, pending, timeout=None):
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            row, attempt = pending.pop(future)
+            self._finish(row, attempt, future.result())
+
+    def _finish(self, row, attempt, result):
+        if attempt < self.max_attempts and is_retryable(result):
+            delay = RETRY_DELAY * 2 ** (attempt - 1)
+            METRICS.inc('bnmp_detail_retries_total', categoria=result.get('categoria'))
+            self.retries.push(row, attempt + 1, delay)
+            return
+        self.save_result(result, attempt)
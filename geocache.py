@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import time
+
+GEOCACHE_FILE = 'output/geocache.sqlite'
+
+# Validade dos resultados: endereços não encontrados expiram antes
+POSITIVE_TTL = 180 * 24 * 3600
+NEGATIVE_TTL = 30 * 24 * 3600
+
+
+class GeocodeCache:
+    def __init__(self, path=GEOCACHE_FILE, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL):
+        """
+        Persistent geocoding results keyed by the canonical address key
+        ('endereco_chave'), including addresses the backend could not find.
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocodes (
+                chave TEXT PRIMARY KEY,
+                lat REAL,
+                lng REAL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, keys):
+        """
+        Return {chave: (lat, lng)} for the keys with a valid entry; a negative
+        result is returned as (None, None).
+        """
+        now = time.time()
+        found = {}
+        keys = list(keys)
+        # Consulta em lotes para não passar do limite de parâmetros do SQLite
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f'SELECT chave, lat, lng, updated_at FROM geocodes WHERE chave IN ({placeholders})', batch
+            )
+            for chave, lat, lng, updated_at in rows:
+                ttl = self.positive_ttl if lat is not None else self.negative_ttl
+                if now - updated_at <= ttl:
+                    found[chave] = (lat, lng)
+        return found
+
+    def put(self, chave, lat, lng):
+        self.put_many([(chave, lat, lng)])
+
+    def put_many(self, results):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO geocodes (chave, lat, lng, updated_at) VALUES (?, ?, ?, ?)',
+                [(chave, lat, lng, now) for chave, lat, lng in results],
+            )
+
+    def invalidate(self, keys=None, negatives_only=False, older_than=None):
+        """
+        Drop cache entries: the given keys, only negative results, entries
+        older than `older_than` seconds, or everything when called without
+        arguments. Returns the number of entries removed.
+        """
+        clauses, params = [], []
+        if keys is not None:
+            keys = list(keys)
+            clauses.append(f"chave IN ({','.join('?' * len(keys))})")
+            params.extend(keys)
+        if negatives_only:
+            clauses.append('lat IS NULL')
+        if older_than is not None:
+            clauses.append('updated_at < ?')
+            params.append(time.time() - older_than)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self.conn:
+            return self.conn.execute(f'DELETE FROM geocodes{where}', params).rowcount
+
+    def close(self):
+        self.conn.close()
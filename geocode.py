@@ -0,0 +1,196 @@
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+from address_normalization import fold_text
+from geocache import GeocodeCache
+from rate_limit import RateLimiter
+from stage_io import iter_stage, stage_path, StageWriter
+from stage_paths import GAZETTEER_FILE, INCOMPLETE
+
+# Backend: 'google' (API do Google Maps) ou 'gazetteer' (centroides locais, sem rede)
+GEOCODER = os.environ.get('GEOCODER', 'google')
+# A chave da API do Google Maps vem do ambiente
+API_KEY_ENV = 'GOOGLE_MAPS_API_KEY'
+
+GEOCODE_WORKERS = 8
+GEOCODE_REQUESTS_PER_SECOND = 40
+MAX_ATTEMPTS = 4
+BACKOFF_FACTOR = 2
+CHUNK_SIZE = 50000
+
+
+class TransientGeocodeError(Exception):
+    """Falha passageira (rede, cota, timeout): vale tentar de novo."""
+
+
+class PermanentGeocodeError(Exception):
+    """Falha que não se resolve tentando de novo (chave inválida, pedido recusado)."""
+
+
+class GoogleBackend:
+    name = 'google'
+    concurrent = True
+    cacheable = True
+
+    def __init__(self, api_key):
+        import googlemaps
+        self.googlemaps = googlemaps
+        self.gmaps = googlemaps.Client(key=api_key)
+
+    def geocode(self, endereco):
+        """
+        Return (lat, lng), or None when the address does not exist.
+        """
+        exceptions = self.googlemaps.exceptions
+        try:
+            geocode_result = self.gmaps.geocode(endereco.endereco_1)
+        except (exceptions.Timeout, exceptions.TransportError) as e:
+            raise TransientGeocodeError(str(e)) from e
+        except exceptions.ApiError as e:
+            if e.status in ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'):
+                raise TransientGeocodeError(str(e)) from e
+            raise PermanentGeocodeError(str(e)) from e
+        if geocode_result:
+            location = geocode_result[0]['geometry']['location']
+            return location['lat'], location['lng']
+        return None
+
+
+class GazetteerBackend:
+    name = 'gazetteer'
+    concurrent = False
+    # Consulta local e barata: não vai para o cache, que manteria centroides antigos por 180 dias
+    cacheable = False
+
+    def __init__(self, path=GAZETTEER_FILE):
+        """
+        Offline backend over an IBGE-style CSV with columns uf, municipio,
+        bairro (empty for the municipality centroid), lat and lng.
+        Resolves the bairro centroid when known, else the municipality's.
+        """
+        self.centroides = {}
+        with open(path, encoding='utf-8') as file:
+            for linha in csv.DictReader(file):
+                chave = self._chave(linha.get('bairro'), linha['municipio'], linha['uf'])
+                self.centroides[chave] = (float(linha['lat']), float(linha['lng']))
+
+    @staticmethod
+    def _chave(bairro, municipio, uf):
+        return fold_text(bairro), fold_text(municipio), fold_text(uf)
+
+    def geocode(self, endereco):
+        municipio, uf = endereco.municipio, endereco.uf
+        return (
+            self.centroides.get(self._chave(endereco.bairro, municipio, uf))
+            or self.centroides.get(self._chave('', municipio, uf))
+        )
+
+
+def make_backend(name=GEOCODER):
+    if name == 'gazetteer':
+        return GazetteerBackend()
+    return GoogleBackend(os.environ[API_KEY_ENV])
+
+
+class Geocoder:
+    def __init__(self, backend, cache, workers=GEOCODE_WORKERS, rate=GEOCODE_REQUESTS_PER_SECOND):
+        """
+        Resolve distinct addresses through the cache (cacheable backends only)
+        and, for misses, a worker pool calling the backend under a shared rate
+        limit. Transient failures
+        are retried with backoff; permanent ones are reported and skipped.
+        """
+        self.backend = backend
+        self.cache = cache
+        self.workers = workers if backend.concurrent else 1
+        self.rate_limiter = RateLimiter(rate if backend.concurrent else None)
+        self.coordenadas = {}
+        self.falhas = 0
+
+    def _cache_key(self, chave):
+        # Cada backend tem suas próprias entradas no cache
+        return f'{self.backend.name}|{chave}'
+
+    def _resolve(self, endereco):
+        for attempt in range(MAX_ATTEMPTS):
+            self.rate_limiter.acquire()
+            try:
+                return endereco.endereco_chave, self.backend.geocode(endereco), None
+            except TransientGeocodeError as e:
+                if attempt + 1 == MAX_ATTEMPTS:
+                    return endereco.endereco_chave, None, e
+                time.sleep(BACKOFF_FACTOR ** attempt)
+            except PermanentGeocodeError as e:
+                return endereco.endereco_chave, None, e
+
+    def resolve(self, df):
+        """
+        Make sure every distinct 'endereco_chave' of df has been resolved.
+        """
+        enderecos = df[df['endereco_chave'].fillna('') != '']
+        enderecos = enderecos.drop_duplicates('endereco_chave')
+        enderecos = enderecos[~enderecos['endereco_chave'].isin(self.coordenadas)]
+        if enderecos.empty:
+            return
+
+        if self.backend.cacheable:
+            cache_keys = {self._cache_key(chave): chave for chave in enderecos['endereco_chave']}
+            for cache_key, coordenada in self.cache.get_many(cache_keys).items():
+                self.coordenadas[cache_keys[cache_key]] = coordenada
+        faltantes = enderecos[~enderecos['endereco_chave'].isin(self.coordenadas)]
+
+        linhas = faltantes.itertuples(index=False)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            resultados = executor.map(self._resolve, linhas) if self.workers > 1 else map(self._resolve, linhas)
+            novos = []
+            for chave, coordenada, erro in tqdm(resultados, total=len(faltantes), desc="Geocodificando endereços"):
+                if erro is not None:
+                    # Falhas não são cacheadas: o endereço volta na próxima execução
+                    self.falhas += 1
+                    print(f"Erro na geocodificação do endereço '{chave}': {erro}")
+                    continue
+                lat, lng = coordenada or (None, None)
+                self.coordenadas[chave] = (lat, lng)
+                novos.append((self._cache_key(chave), lat, lng))
+            if self.backend.cacheable:
+                self.cache.put_many(novos)
+
+    def geocode_dataframe(self, df):
+        """
+        Return df with 'lat'/'lng' columns.
+        """
+        self.resolve(df)
+        vazio = (None, None)
+        coordenadas = df['endereco_chave'].map(lambda chave: self.coordenadas.get(chave, vazio))
+        df = df.copy()
+        df['lat'] = coordenadas.str[0].astype(float)
+        df['lng'] = coordenadas.str[1].astype(float)
+        return df
+
+
+def run(backend=None, chunk_size=CHUNK_SIZE):
+    """
+    Geocode the 'dados_finais' stage chunk by chunk, streaming each geocoded
+    chunk into 'dados_geocodificados'. Returns INCOMPLETE when some address
+    failed, so the pipeline runs the stage again instead of caching it.
+    """
+    backend = backend or make_backend()
+    cache = GeocodeCache()
+    geocoder = Geocoder(backend, cache)
+    try:
+        with StageWriter('dados_geocodificados') as writer:
+            for chunk in iter_stage('dados_finais', chunk_size):
+                writer.write(geocoder.geocode_dataframe(chunk))
+    finally:
+        cache.close()
+    print(f"{len(geocoder.coordenadas)} endereços resolvidos, {geocoder.falhas} falhas.")
+    # As falhas não foram cacheadas: a próxima execução tenta só esses endereços de novo
+    return INCOMPLETE if geocoder.falhas else None
+
+
+if __name__ == "__main__":
+    run()
+
+    print('Geocodificação concluída e dados salvos em', stage_path('dados_geocodificados'))
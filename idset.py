@@ -0,0 +1,70 @@
+import threading
+
+# Bits por bloco do bitmap (8 KiB por bloco ocupado)
+CHUNK_BITS = 1 << 16
+
+
+class IdSet:
+    def __init__(self, ids=()):
+        """
+        Set of warrant ids kept as a chunked bitmap: numeric ids cost one bit
+        inside the 8 KiB chunk covering their range, so millions of ids fit in
+        a few MiB. Ids that are not plain non-negative integers (or their
+        decimal strings) fall back to a regular set.
+        """
+        self._chunks = {}
+        self._other = set()
+        self._len = 0
+        self._lock = threading.Lock()
+        self.update(ids)
+
+    @staticmethod
+    def _as_int(id_valor):
+        if isinstance(id_valor, int) and not isinstance(id_valor, bool) and id_valor >= 0:
+            return id_valor
+        if isinstance(id_valor, str) and id_valor.isdigit() and str(int(id_valor)) == id_valor:
+            return int(id_valor)
+        return None
+
+    def add(self, id_valor):
+        """
+        Add an id; returns True when it was not in the set yet.
+        """
+        number = self._as_int(id_valor)
+        with self._lock:
+            if number is None:
+                if id_valor in self._other:
+                    return False
+                self._other.add(id_valor)
+            else:
+                chunk_index, bit = divmod(number, CHUNK_BITS)
+                chunk = self._chunks.get(chunk_index)
+                if chunk is None:
+                    chunk = self._chunks[chunk_index] = bytearray(CHUNK_BITS // 8)
+                byte, mask = bit >> 3, 1 << (bit & 7)
+                if chunk[byte] & mask:
+                    return False
+                chunk[byte] |= mask
+            self._len += 1
+            return True
+
+    def update(self, ids):
+        for id_valor in ids:
+            self.add(id_valor)
+
+    def __contains__(self, id_valor):
+        number = self._as_int(id_valor)
+        if number is None:
+            return id_valor in self._other
+        chunk_index, bit = divmod(number, CHUNK_BITS)
+        chunk = self._chunks.get(chunk_index)
+        return chunk is not None and bool(chunk[bit >> 3] & (1 << (bit & 7)))
+
+    def __len__(self):
+        return self._len
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self._other.clear()
+            self._len = 0
@@ -0,0 +1,139 @@
+import codecs
+import glob
+import json
+import os
+import threading
+import pandas as pd
+import pyarrow.parquet as pq
+from metrics import METRICS
+from stage_io import to_table
+
+# Colunas que o save_excel original já descartava
+DROPPED_COLUMNS = ('dataExpedicao', 'dataNascimento')
+# Bytes lidos por vez ao reler a listagem de uma execução anterior
+READ_BLOCK = 1 << 20
+
+
+class ListingAuditWriter:
+    def __init__(self, json_path, parts_dir, resume_offset=None):
+        """
+        Write the listing pages to the audit files as they arrive,
+        without keeping the whole state in memory: the JSON array and one
+        Parquet part per page in parts_dir, named after the JSON offset where
+        the page starts.
+        With resume_offset, keep the first resume_offset bytes of the JSON
+        written by a previous run and append after them; only their item
+        count is kept, and iter_previous_items streams them back.
+        Callers writing from several threads hold `lock` around write_page
+        and the checkpoint update that follows it.
+        """
+        self.json_path = json_path
+        self.parts_dir = parts_dir
+        self.resume_offset = resume_offset
+        self.lock = threading.RLock()
+        self.count = 0
+        self.offset = 0
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.json_path) or '.', exist_ok=True)
+        os.makedirs(self.parts_dir, exist_ok=True)
+
+        if self.resume_offset and os.path.exists(self.json_path):
+            self.json_file = open(self.json_path, 'r+b')
+            self.json_file.truncate(self.resume_offset)
+            self.json_file.seek(0, os.SEEK_END)
+        else:
+            self.resume_offset = None
+            self.json_file = open(self.json_path, 'wb')
+            self.json_file.write(b'[')
+        self.offset = self.json_file.tell()
+
+        # Partes de páginas que não chegaram a ser confirmadas no checkpoint
+        for part in glob.glob(os.path.join(self.parts_dir, 'part-*.parquet')):
+            if not self.resume_offset or self._part_offset(part) >= self.offset:
+                os.remove(part)
+        # Cada página confirmada tem sua parte: o total sai dos metadados, sem reler o JSON
+        if self.resume_offset:
+            self.count = sum(
+                pq.ParquetFile(part).metadata.num_rows
+                for part in glob.glob(os.path.join(self.parts_dir, 'part-*.parquet'))
+            )
+        return self
+
+    def iter_previous_items(self):
+        """
+        Yield the items kept from the previous run's JSON one at a time,
+        reading it in blocks, so a resumed listing is never held whole.
+        """
+        if not self.resume_offset:
+            return
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        with open(self.json_path, 'rb') as file:
+            # Pula o '[' inicial; só os bytes confirmados no checkpoint são relidos
+            file.seek(1)
+            remaining = self.resume_offset - 1
+            buffer, pos = '', 0
+            while True:
+                # Separadores entre itens: ',' e a indentação de _write_json
+                while pos < len(buffer) and buffer[pos] in ', \n':
+                    pos += 1
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if not remaining:
+                        if buffer[pos:].strip():
+                            raise
+                        return
+                    block = file.read(min(READ_BLOCK, remaining))
+                    remaining -= len(block)
+                    buffer = buffer[pos:] + utf8.decode(block, final=not remaining)
+                    pos = 0
+                    continue
+                yield item
+
+    def write_page(self, items):
+        with self.lock:
+            start = self.offset
+            for item in items:
+                self._write_json(item)
+                self.count += 1
+            self.json_file.flush()
+            self.offset = self.json_file.tell()
+            METRICS.inc('bnmp_bytes_written_total', self.offset - start, arquivo='listagem_json')
+            if items:
+                self._write_part(items, start)
+
+    def _write_json(self, item):
+        # Mesmo layout de json.dump(..., indent=4), um item por vez
+        text = json.dumps(item, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+        self.json_file.write(((',\n    ' if self.count else '\n    ') + text).encode('utf-8'))
+
+    def _write_part(self, items, start):
+        # Fora o id, tudo vira texto: as partes ficam com o mesmo esquema
+        rows = []
+        for item in items:
+            row = {}
+            for column, value in item.items():
+                if column in DROPPED_COLUMNS:
+                    continue
+                if isinstance(value, (dict, list)):
+                    value = json.dumps(value, ensure_ascii=False)
+                elif value is not None and column != 'id':
+                    value = str(value)
+                row[column] = value
+            rows.append(row)
+        table = to_table(pd.DataFrame(rows), 'dados_gerais')
+        part_path = os.path.join(self.parts_dir, f'part-{start:012d}.parquet')
+        pq.write_table(table, part_path)
+        METRICS.inc('bnmp_bytes_written_total', os.path.getsize(part_path), arquivo='listagem_parquet')
+
+    @staticmethod
+    def _part_offset(part):
+        return int(os.path.basename(part)[len('part-'):-len('.parquet')])
+
+    def __exit__(self, exc_type, exc, tb):
+        self.json_file.write(b'\n]' if self.count else b']')
+        self.json_file.close()
+        print(f"Listagem gravada em '{self.parts_dir}' ({self.count} itens).")
+        return False
@@ -0,0 +1,230 @@
+import bisect
+import os
+import threading
+import time
+
+# Arquivo no formato texto do Prometheus (node_exporter --collector.textfile)
+METRICS_FILE = 'metrics.prom'
+# Segundos entre duas regravações do arquivo / linhas de progresso
+REPORT_INTERVAL = 15
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        """
+        In-process counters, histograms and gauges, cheap enough for the hot
+        path and rendered in the Prometheus text format. Gauges are either set
+        or read from a callable (e.g. a queue's qsize) at render time.
+        """
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.gauge_callbacks = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def gauge(self, name, callback, **labels):
+        with self._lock:
+            self.gauge_callbacks.setdefault(name, {})[_label_key(labels)] = callback
+
+    def total(self, name, **labels):
+        """
+        Sum of a counter over the series matching the given labels.
+        """
+        wanted = set(_label_key(labels))
+        with self._lock:
+            return sum(value for key, value in self.counters.get(name, {}).items() if wanted <= set(key))
+
+    def histogram_totals(self, name, label):
+        """
+        {label value: (count, sum)} of a histogram, e.g. requests and summed
+        latency per endpoint.
+        """
+        totals = {}
+        with self._lock:
+            for key, histogram in self.histograms.get(name, {}).items():
+                value = dict(key).get(label)
+                count, total = totals.get(value, (0, 0.0))
+                totals[value] = (count + histogram.count, total + histogram.sum)
+        return totals
+
+    def value(self, name, **labels):
+        key = _label_key(labels)
+        callback = self.gauge_callbacks.get(name, {}).get(key)
+        if callback is not None:
+            return callback()
+        return self.gauges.get(name, {}).get(key)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self.counters.items()}
+            gauges = {name: dict(series) for name, series in self.gauges.items()}
+            callbacks = {name: dict(series) for name, series in self.gauge_callbacks.items()}
+            histograms = {
+                name: {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in series.items()}
+                for name, series in self.histograms.items()
+            }
+
+        for name, series in sorted(counters.items()):
+            lines.append(f'# TYPE {name} counter')
+            lines += [f'{name}{_format_labels(key)} {value}' for key, value in sorted(series.items())]
+        for name in sorted(set(gauges) | set(callbacks)):
+            lines.append(f'# TYPE {name} gauge')
+            for key, value in sorted(gauges.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(key)} {value}')
+            for key, callback in sorted(callbacks.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(key)} {callback()}')
+        for name, series in sorted(histograms.items()):
+            lines.append(f'# TYPE {name} histogram')
+            for key, (buckets, counts, total, count) in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(key)} {total}')
+                lines.append(f'{name}_count{_format_labels(key)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Registro do processo, compartilhado por transporte, raspadores e gravadores
+METRICS = Metrics()
+
+
+def _format_eta(seconds):
+    if seconds is None:
+        return '--:--:--'
+    seconds = int(seconds)
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+class MetricsReporter:
+    def __init__(self, path, metrics=METRICS, interval=REPORT_INTERVAL, extra=None):
+        """
+        Every interval seconds: derive the rates (pages/s, items/s, details/s,
+        401 and retry ratios), rewrite the Prometheus text file at path and
+        print a one-line progress summary with an ETA, followed by extra()
+        when given.
+        The ETA uses 'bnmp_itens_previstos' when set, else the items listed
+        so far.
+        """
+        self.path = path
+        self.metrics = metrics
+        self.interval = interval
+        self.extra = extra
+        self._stop = threading.Event()
+        self._thread = None
+        self._last = None
+
+    def _snapshot(self):
+        m = self.metrics
+        return {
+            'time': time.monotonic(),
+            'pages': m.total('bnmp_listing_pages_total'),
+            'items': m.total('bnmp_listing_items_total'),
+            'details': m.total('bnmp_details_total'),
+            'requests': m.total('bnmp_requests_total'),
+            '401': m.total('bnmp_requests_total', status=401),
+            'retries': m.total('bnmp_detail_retries_total'),
+        }
+
+    def report(self):
+        now = self._snapshot()
+        last = self._last or now
+        self._last = now
+        elapsed = now['time'] - last['time']
+
+        def rate(field):
+            return (now[field] - last[field]) / elapsed if elapsed > 0 else 0.0
+
+        def ratio(field, base):
+            delta = now[base] - last[base]
+            return (now[field] - last[field]) / delta if delta else 0.0
+
+        m = self.metrics
+        m.set('bnmp_pages_per_second', rate('pages'))
+        m.set('bnmp_items_per_second', rate('items'))
+        m.set('bnmp_details_per_second', rate('details'))
+        m.set('bnmp_401_ratio', ratio('401', 'requests'))
+        m.set('bnmp_retry_ratio', ratio('retries', 'details'))
+        self._write(m.render())
+
+        total = m.value('bnmp_itens_previstos') or now['items']
+        details_rate = rate('details')
+        eta = (total - now['details']) / details_rate if details_rate > 0 and total >= now['details'] else None
+        written = m.total('bnmp_bytes_written_total') / 1e6
+        depth = m.value('bnmp_queue_depth', queue='detalhes')
+        session = '' if m.value('bnmp_session_valid') in (None, 1) else ' | SESSÃO BLOQUEADA'
+        extra = self.extra() if self.extra is not None else ''
+        extra = f' | {extra}' if extra else ''
+        print(
+            f"[progresso] {now['details']}/{total} detalhes | {rate('pages'):.1f} pág/s | "
+            f"{rate('items'):.0f} itens/s | {details_rate:.1f} det/s | 401 {ratio('401', 'requests'):.1%} | "
+            f"retry {ratio('retries', 'details'):.1%} | fila {depth if depth is not None else '-'} | "
+            f"{written:.1f} MB | ETA {_format_eta(eta)}{session}{extra}"
+        )
+
+    def _write(self, text):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(tmp_path, self.path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self._last = self._snapshot()
+        self._thread = threading.Thread(target=self._loop, name='metricas', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
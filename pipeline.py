@@ -0,0 +1,408 @@
+import argparse
+import contextlib
+import cProfile
+import datetime
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from stage_paths import INCOMPLETE
+
+OUTPUT_DIR = 'output'
+# Hashes de entradas/saídas de cada etapa já executada
+CACHE_FILE = os.path.join(OUTPUT_DIR, 'pipeline_cache.json')
+# Etapas independentes executadas ao mesmo tempo
+MAX_PARALLEL_STAGES = 2
+HASH_BLOCK = 1024 * 1024
+# Os fontes de cada etapa entram na chave do cache
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Relatórios do modo --perfil (um JSON por execução e o cProfile da etapa mais lenta)
+PROFILE_DIR = os.path.join(OUTPUT_DIR, 'perfil')
+
+
+class Stage:
+    def __init__(self, name, target, inputs=(), outputs=(), deps=(), version='1', sources=(), optional=False):
+        """
+        One step of the pipeline. target is 'module:function', imported only
+        when the stage actually runs. The stage is skipped when its version,
+        the source of its modules and the content of its inputs hash to the
+        same key as in the last successful run and its outputs still exist.
+        An optional stage only runs when asked for by name.
+        """
+        self.name = name
+        self.target = target
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.version = version
+        self.optional = optional
+        self.sources = [os.path.join(SOURCE_DIR, source) for source in sources or [target.split(':')[0] + '.py']]
+
+    def call(self, **kwargs):
+        module, function = self.target.split(':')
+        return getattr(importlib.import_module(module), function)(**kwargs)
+
+
+def stages():
+    """
+    The post-processing DAG, from the raw responses to the final dataset.
+    """
+    from response_store import RESPONSES_DIR
+    from stage_paths import stage_path, MERGED_FILE, GAZETTEER_FILE
+
+    responses = os.path.join(OUTPUT_DIR, RESPONSES_DIR)
+    geocoder = os.environ.get('GEOCODER', 'google')
+    return [
+        Stage('limpeza', 'postprocess:run',
+              inputs=[responses], outputs=[stage_path('dados_finais'), stage_path('dados_erros')],
+              sources=['postprocess.py', 'certidao_schema.py', 'address_normalization.py', 'stage_io.py',
+                       'response_store.py']),
+        # Cópia de conferência das respostas, sem compressão; não alimenta outras etapas
+        # e só roda quando pedida (--etapas mesclagem)
+        Stage('mesclagem', 'postprocess:write_merged',
+              inputs=[responses], outputs=[MERGED_FILE], sources=['postprocess.py'], optional=True),
+        # Com o geocodificador offline, trocar os centroides refaz a etapa
+        Stage('geocodificacao', 'geocode:run', deps=['limpeza'],
+              inputs=[stage_path('dados_finais')] + ([GAZETTEER_FILE] if geocoder == 'gazetteer' else []),
+              outputs=[stage_path('dados_geocodificados')],
+              version=geocoder, sources=['geocode.py', 'geocache.py']),
+        Stage('montagem', 'address:run', deps=['geocodificacao'],
+              inputs=[stage_path('dados_gerais'), stage_path('dados_geocodificados')],
+              outputs=[stage_path('mandados_bnmp')], sources=['address.py', 'delta.py', 'stage_io.py']),
+    ]
+
+
+class HashCache:
+    def __init__(self, path=CACHE_FILE):
+        """
+        Content hashes of files and directories, memoized by (size, mtime) so
+        unchanged files are not read again, plus the key of each stage's last
+        successful run.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            data = {}
+        self.files = data.get('files', {})
+        self.stages = data.get('stages', {})
+
+    def file_hash(self, path):
+        stat = os.stat(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            known = self.files.get(path)
+        if known and known[0] == signature:
+            return known[1]
+        digest = hashlib.blake2b()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK), b''):
+                digest.update(block)
+        with self._lock:
+            self.files[path] = [signature, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path_hash(self, path):
+        """
+        Hash of a file, or of every file under a directory (names included);
+        'ausente' for a missing path.
+        """
+        if not os.path.exists(path):
+            return 'ausente'
+        if not os.path.isdir(path):
+            return self.file_hash(path)
+        digest = hashlib.blake2b()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                digest.update(self.file_hash(file_path).encode('ascii'))
+        return digest.hexdigest()
+
+    def stage_key(self, stage):
+        digest = hashlib.blake2b(f'{stage.name}|{stage.version}'.encode('utf-8'))
+        for path in stage.sources + stage.inputs:
+            digest.update(f'|{path}={self.path_hash(path)}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def is_fresh(self, stage, key):
+        return self.stages.get(stage.name) == key and all(os.path.exists(path) for path in stage.outputs)
+
+    def record(self, stage, key):
+        with self._lock:
+            self.stages[stage.name] = key
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._lock:
+            data = {'files': self.files, 'stages': self.stages}
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
+
+
+def _reset_peak_rss():
+    # Linux: zera o pico de memória residente (VmHWM) do processo
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _children_peak_rss_mb():
+    # Maior RSS entre os processos filhos já encerrados (ex.: o pool da limpeza); Unix apenas
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024
+
+
+def _cpu_times():
+    # os.times funciona também no Windows (onde o tempo dos filhos vem zerado)
+    times = os.times()
+    return times.user, times.system, times.children_user + times.children_system
+
+
+class StageProfiler:
+    def __init__(self, cprofile=False, directory=PROFILE_DIR):
+        """
+        Wall time, CPU time (user, system and child processes) and peak memory
+        of each stage: Python allocations traced by tracemalloc and, on Linux,
+        the resident set high-water mark, which also covers Arrow buffers.
+        Both are process-wide, so stages must run one at a time while
+        profiling. Worker processes (limpeza's decoding pool) are not in
+        those figures: on Unix the largest child RSS seen so far is reported
+        apart, and it cannot be reset between stages. With cprofile, every stage runs under cProfile and the
+        dump of the slowest one is kept.
+        """
+        self.cprofile = cprofile
+        self.directory = directory
+        self.records = []
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        record = {'etapa': name, 'estado': 'executada'}
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        rss_reset = _reset_peak_rss()
+        user, system, children = _cpu_times()
+        profile = cProfile.Profile() if self.cprofile else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        except BaseException:
+            record['estado'] = 'falhou'
+            raise
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - start
+            end_user, end_system, end_children = _cpu_times()
+            peak_rss = _peak_rss_mb() if rss_reset else None
+            children_rss = _children_peak_rss_mb()
+            record.update(
+                segundos=round(wall, 3),
+                cpu_usuario=round(end_user - user, 3),
+                cpu_sistema=round(end_system - system, 3),
+                cpu_filhos=round(end_children - children, 3),
+                pico_python_mb=round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1),
+                pico_rss_mb=round(peak_rss, 1) if peak_rss is not None else None,
+                pico_rss_filhos_mb=round(children_rss, 1) if children_rss is not None else None,
+            )
+            with self._lock:
+                self.records.append(record)
+                if profile is not None:
+                    self._profiles[name] = profile
+
+    def skipped(self, name):
+        with self._lock:
+            self.records.append({'etapa': name, 'estado': 'em cache'})
+
+    def report(self):
+        """
+        Write the run's summary (and the slowest stage's cProfile dump) to
+        the profile directory, print it and return the JSON path.
+        """
+        tracemalloc.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = f'{datetime.datetime.now():%Y%m%d-%H%M%S}'
+        executed = [record for record in self.records if 'segundos' in record]
+        slowest = max(executed, key=lambda record: record['segundos'], default=None)
+        summary = {'data': stamp, 'etapas': self.records, 'mais_lenta': slowest and slowest['etapa']}
+        if slowest is not None and slowest['etapa'] in self._profiles:
+            dump = os.path.join(self.directory, f"perfil-{stamp}-{slowest['etapa']}.prof")
+            self._profiles[slowest['etapa']].dump_stats(dump)
+            summary['cprofile'] = dump
+
+        path = os.path.join(self.directory, f'perfil-{stamp}.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+
+        print(f"{'etapa':<16}{'estado':<11}{'parede s':>10}{'cpu s':>10}{'filhos s':>10}{'python MB':>11}{'rss MB':>9}"
+              f"{'rss filhos MB':>15}")
+        for record in self.records:
+            if 'segundos' not in record:
+                print(f"{record['etapa']:<16}{record['estado']:<11}")
+                continue
+            rss, children_rss = record['pico_rss_mb'], record['pico_rss_filhos_mb']
+            print(f"{record['etapa']:<16}{record['estado']:<11}{record['segundos']:>10.1f}"
+                  f"{record['cpu_usuario'] + record['cpu_sistema']:>10.1f}{record['cpu_filhos']:>10.1f}"
+                  f"{record['pico_python_mb']:>11.1f}{rss if rss is not None else '-':>9}"
+                  f"{children_rss if children_rss is not None else '-':>15}")
+        print(f"Perfil gravado em {path}" + (f" (cProfile: {summary['cprofile']})" if 'cprofile' in summary else ''))
+        return path
+
+
+def run(only=None, force=(), workers=MAX_PARALLEL_STAGES, stage_list=None, profiler=None):
+    """
+    Run the DAG in this process. Stages whose dependencies are done are
+    started together (up to workers at a time); cached stages are skipped.
+    only restricts the run to the named stages and their dependencies;
+    force reruns the named stages (and, through their outputs, what depends
+    on them). Optional stages run only when named in only. A stage that
+    returns INCOMPLETE is not cached, so it runs again next time. With a
+    StageProfiler, each executed stage is measured.
+    Returns {stage: 'executada' | 'incompleta' | 'em cache'}.
+    """
+    stage_list = stage_list or stages()
+    by_name = {stage.name: stage for stage in stage_list}
+    if only:
+        wanted, pending_names = set(), list(only)
+        while pending_names:
+            name = pending_names.pop()
+            if name not in wanted:
+                wanted.add(name)
+                pending_names.extend(by_name[name].deps)
+        stage_list = [stage for stage in stage_list if stage.name in wanted]
+    else:
+        stage_list = [stage for stage in stage_list if not stage.optional]
+
+    cache = HashCache()
+    results = {}
+    remaining = {stage.name: stage for stage in stage_list}
+
+    def execute(stage):
+        key = cache.stage_key(stage)
+        if stage.name not in force and cache.is_fresh(stage, key):
+            print(f"[{stage.name}] Sem mudanças nas entradas; etapa pulada.")
+            if profiler is not None:
+                profiler.skipped(stage.name)
+            return 'em cache'
+        print(f"[{stage.name}] Executando...")
+        start = time.monotonic()
+        with profiler.measure(stage.name) if profiler is not None else contextlib.nullcontext():
+            result = stage.call()
+        if result == INCOMPLETE:
+            print(f"[{stage.name}] Concluída com pendências em {time.monotonic() - start:.1f}s; "
+                  f"será executada de novo na próxima vez.")
+            return INCOMPLETE
+        cache.record(stage, key)
+        cache.save()
+        print(f"[{stage.name}] Concluída em {time.monotonic() - start:.1f}s.")
+        return 'executada'
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while remaining or running:
+            for name, stage in list(remaining.items()):
+                if all(dep in results for dep in stage.deps):
+                    running[executor.submit(execute, stage)] = name
+                    del remaining[name]
+            if not running:
+                raise RuntimeError(f"Dependências impossíveis de satisfazer: {', '.join(remaining)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def scrape(ufs=None):
+    """
+    Crawl the portal: one state in this process, or several through the
+    multi-state scheduler. Returns False when the crawl did not finish, so
+    post-processing does not run on partial data.
+    """
+    if ufs:
+        import scheduler
+        return scheduler.main(ufs)
+    import bnmp
+    return bnmp.main()
+
+
+def profile_scrape(profiler, ufs=None):
+    """
+    Run scrape() under the profiler. Listing and details overlap in time, so
+    the record also splits the summed request time per endpoint.
+    """
+    from metrics import METRICS
+    with profiler.measure('raspagem') as record:
+        try:
+            return scrape(ufs)
+        finally:
+            record['rede'] = {
+                endpoint: {'requisicoes': count, 'segundos_somados': round(seconds, 1)}
+                for endpoint, (count, seconds) in METRICS.histogram_totals('bnmp_request_seconds', 'endpoint').items()
+            }
+            record['paginas'] = METRICS.total('bnmp_listing_pages_total')
+            record['detalhes'] = METRICS.total('bnmp_details_total')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline do BNMP: raspagem e pós-processamento.")
+    parser.add_argument('--raspar', action='store_true', help="raspa o portal antes do pós-processamento")
+    parser.add_argument('--estados', nargs='*', metavar='UF', help="UFs a raspar em paralelo (scheduler)")
+    parser.add_argument('--etapas', nargs='*', metavar='ETAPA', help="executa só estas etapas (e suas dependências)")
+    parser.add_argument('--forcar', nargs='*', default=(), metavar='ETAPA', help="ignora o cache destas etapas")
+    parser.add_argument('--paralelas', type=int, default=MAX_PARALLEL_STAGES, help="etapas independentes ao mesmo tempo")
+    parser.add_argument('--perfil', '--profile', action='store_true',
+                        help="mede tempo, CPU e pico de memória de cada etapa (roda uma etapa por vez)")
+    parser.add_argument('--perfil-cprofile', action='store_true', help="com --perfil, guarda o cProfile da etapa mais lenta")
+    args = parser.parse_args(argv)
+
+    profiler = StageProfiler(cprofile=args.perfil_cprofile) if args.perfil else None
+    # Memória e CPU são medidas por processo: com perfil, uma etapa de cada vez
+    workers = 1 if profiler is not None else args.paralelas
+    ufs = [uf.upper() for uf in args.estados or []]
+    try:
+        if args.raspar or args.estados:
+            scraped = profile_scrape(profiler, ufs) if profiler is not None else scrape(ufs)
+            if not scraped:
+                return
+        run(only=args.etapas, force=set(args.forcar), workers=workers, profiler=profiler)
+    finally:
+        if profiler is not None:
+            profiler.report()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,237 @@
+import contextlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from address_normalization import ADDRESS_FIELDS, normalize_addresses
+from certidao_schema import decode_line
+from response_store import segment_paths, iter_live, live_slices, RESPONSES_DIR
+from stage_io import StageWriter, SCHEMAS
+from stage_paths import MERGED_FILE
+
+# Respostas brutas da raspagem: diretório do ResponseStore (um NDJSON avulso
+# também é aceito). As falhas passageiras já são refeitas durante a raspagem
+RESPONSES_FILE = os.path.join('output', RESPONSES_DIR)
+# Processos lendo segmentos do ResponseStore em paralelo
+POSTPROCESS_WORKERS = os.cpu_count() or 1
+# Registros normalizados e gravados por vez: a memória fica limitada a alguns
+# lotes em andamento, qualquer que seja o tamanho das respostas
+CHUNK_RECORDS = 50000
+
+DADOS_COLUMNS = ['id', 'tipificacaoPenal', 'cpf'] + ADDRESS_FIELDS
+ERROS_COLUMNS = ['id', 'peca', 'categoria', 'status', 'tentativas', 'error']
+
+
+def _texto(valor):
+    return '' if valor is None else valor
+
+
+def _numero(valor):
+    # Números vindos como float (12.0) viram texto sem a parte decimal
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return None if valor is None else str(valor)
+
+
+# Campos estruturados do primeiro endereço; o texto é montado depois, por coluna
+def campos_endereco(enderecos):
+    if enderecos:
+        endereco = enderecos[0]  # Considerando o primeiro endereço da lista
+        return {
+            "logradouro": endereco.logradouro,
+            "numero": _numero(endereco.numero),
+            "bairro": endereco.bairro,
+            "municipio": endereco.municipio.nome if endereco.municipio else None,
+            "uf": endereco.estado.sigla if endereco.estado else None,
+        }
+    return dict.fromkeys(ADDRESS_FIELDS)
+
+
+# Função para buscar o CPF no documento
+def buscar_cpf(documentos):
+    for documento in documentos:
+        if documento.tipoDocumento and documento.tipoDocumento.descricao == 'CPF':
+            cpf = documento.numero
+            if cpf:
+                return _numero(cpf).zfill(11)  # Garantir que o CPF tenha 11 dígitos, incluindo zeros à esquerda
+    return None
+
+
+def extract_first_tipificacao(tipificacoes):
+    if tipificacoes:
+        first_tipificacao = tipificacoes[0]
+        return first_tipificacao.split(';')[0]
+    return ''
+
+
+def is_error(item):
+    """
+    True for a saved line whose detail could not be fetched (or decoded).
+    """
+    return item.error is not None or (item.response is not None and item.response.error is not None)
+
+
+def process_record(item):
+    """
+    Split one decoded line into (dado, None) or (None, erro).
+    """
+    if is_error(item):
+        return None, {
+            "id": item.id,
+            "peca": item.peca or '',
+            "categoria": item.categoria,
+            "status": item.status,
+            "tentativas": item.tentativas,
+            "error": item.error or item.response.error
+        }
+
+    response = item.response
+    pessoa = response.pessoa if response is not None else None
+    # Listas ausentes ou null contam como vazias
+    enderecos = (pessoa.enderecos if pessoa is not None else None) or []
+    documentos = (pessoa.documento if pessoa is not None else None) or []
+    tipificacao_penal = [_texto(tp.rotulo) for tp in (response.tipificacaoPenal if response is not None else None) or []]
+    cpf = buscar_cpf(documentos)
+
+    return {
+        "id": item.id,
+        "tipificacaoPenal": tipificacao_penal,
+        "cpf": cpf,
+        **campos_endereco(enderecos)
+    }, None
+
+
+def iter_lines(file_path):
+    """
+    Yield (raw_line, decoded_line) for the non-blank lines of an NDJSON file
+    or of the current record of every id in a ResponseStore directory.
+    Only the fields in certidao_schema are materialized.
+    """
+    if not os.path.exists(file_path):
+        print(f"Aviso: o arquivo {file_path} não foi encontrado.")
+        return
+    if os.path.isdir(file_path):
+        for segment in segment_paths(file_path):
+            for line in iter_live(file_path, segment):
+                yield line, decode_line(line)
+        return
+    with open(file_path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line, decode_line(line)
+
+
+def process_items(items):
+    """
+    Split decoded lines into the (dados, erros) record lists.
+    """
+    dados = []
+    erros = []
+    for item in items:
+        dado, erro = process_record(item)
+        if dado:
+            dados.append(dado)
+        if erro:
+            erros.append(erro)
+    return dados, erros
+
+
+def to_frames(dados, erros):
+    """
+    Build the normalized (df_dados, df_erros) from the record lists.
+    """
+    df_dados = pd.DataFrame(dados, columns=DADOS_COLUMNS)
+    df_erros = pd.DataFrame(erros, columns=ERROS_COLUMNS)
+
+    # Endereço de exibição ('endereco_1') e chave canônica para geocodificação
+    df_dados = normalize_addresses(df_dados)
+
+    df_dados['tipificacaoPenal'] = df_dados['tipificacaoPenal'].apply(lambda x: [extract_first_tipificacao(x)])
+
+    return df_dados, df_erros
+
+
+def _process_slice(directory, segment, start=0, end=None):
+    return to_frames(*process_items(decode_line(line) for line in iter_live(directory, segment, start, end)))
+
+
+def _slices(responses_path, chunk_size):
+    for segment, start, end in live_slices(responses_path, chunk_size):
+        yield responses_path, segment, start, end
+
+
+def iter_chunks(responses_path=RESPONSES_FILE, chunk_size=CHUNK_RECORDS, workers=POSTPROCESS_WORKERS):
+    """
+    Yield (df_dados, df_erros) for about chunk_size records at a time, in file
+    order. Slices of the ResponseStore segments are decoded in parallel
+    processes, with at most two slices per worker in flight.
+    """
+    if os.path.isdir(responses_path) and workers > 1:
+        slices = _slices(responses_path, chunk_size)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = [executor.submit(_process_slice, *task) for task in itertools.islice(slices, workers * 2)]
+            while pending:
+                frames = pending.pop(0).result()
+                pending.extend(executor.submit(_process_slice, *task) for task in itertools.islice(slices, 1))
+                yield frames
+        return
+
+    # O lote é consumido direto do gerador: só os registros já extraídos ficam vivos
+    items = (item for _, item in iter_lines(responses_path))
+    while True:
+        dados, erros = process_items(itertools.islice(items, chunk_size))
+        if not dados and not erros:
+            return
+        yield to_frames(dados, erros)
+
+
+def process(responses_path=RESPONSES_FILE, workers=POSTPROCESS_WORKERS):
+    """
+    Read the raw responses once and return (df_dados, df_erros), whole, in
+    memory. Malformed lines end up in df_erros. The segments of a
+    ResponseStore are decoded in parallel processes. run() writes the same
+    tables chunk by chunk instead.
+    """
+    segments = segment_paths(responses_path) if os.path.isdir(responses_path) else []
+    if workers > 1 and len(segments) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+            frames = list(executor.map(_process_slice, [responses_path] * len(segments), segments))
+        if frames:
+            return (
+                pd.concat([dados for dados, _ in frames], ignore_index=True),
+                pd.concat([erros for _, erros in frames], ignore_index=True),
+            )
+        return to_frames([], [])
+    return to_frames(*process_items(item for _, item in iter_lines(responses_path)))
+
+
+def run(responses_path=RESPONSES_FILE, write_clean=True, chunk_size=CHUNK_RECORDS):
+    """
+    Process the responses chunk_size records at a time, appending each chunk
+    to the 'dados_erros' stage (and to 'dados_finais' when write_clean is
+    set), so memory does not grow with the input. Returns the number of
+    (dados, erros) rows written.
+    """
+    rows_dados = rows_erros = 0
+    with contextlib.ExitStack() as stack:
+        dados_writer = stack.enter_context(StageWriter('dados_finais', schema=SCHEMAS['dados_finais'])) if write_clean else None
+        erros_writer = stack.enter_context(StageWriter('dados_erros', schema=SCHEMAS['dados_erros']))
+        for df_dados, df_erros in iter_chunks(responses_path, chunk_size):
+            rows_dados += len(df_dados)
+            rows_erros += len(df_erros)
+            if dados_writer is not None and len(df_dados):
+                dados_writer.write(df_dados)
+            if len(df_erros):
+                erros_writer.write(df_erros)
+    return rows_dados, rows_erros
+
+
+def write_merged(output_file_path=MERGED_FILE, responses_path=RESPONSES_FILE):
+    """
+    Write the current responses as NDJSON (audit copy of what process() reads).
+    """
+    with open(output_file_path, 'wb') as file:
+        for line, _ in iter_lines(responses_path):
+            file.write(line + b'\n')
+    return output_file_path
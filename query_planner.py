@@ -0,0 +1,219 @@
+import copy
+import json
+import os
+import requests
+
+# Tamanho máximo de uma subconsulta, em páginas de MAX_ITEMS_PER_PAGE itens
+MAX_PAGE_DEPTH = 100
+# Campo do corpo do filtro com o tipo de peça (ids do PECA_MAP)
+PECA_FILTER_FIELD = 'idTipoPeca'
+# Árvore de órgãos expedidores: [{"id": ..., "filhos": [...]}, ...], por UF ou lista única;
+# baixada do portal (e gravada aqui) quando o estado ainda não está no arquivo
+ORGAOS_FILE = 'dados/orgaos.json'
+# Diferença aceita entre a soma das subconsultas e a consulta dividida (itens expedidos
+# durante o planejamento); acima dela o portal não aplicou o filtro e a divisão é descartada
+SPLIT_TOLERANCE = 0.01
+
+
+class PecaDimension:
+    """Divide uma consulta por tipo de peça."""
+
+    def __init__(self, peca_ids):
+        self.peca_ids = list(peca_ids)
+
+    def split(self, body):
+        if PECA_FILTER_FIELD in body:
+            return []
+        return [{PECA_FILTER_FIELD: peca_id} for peca_id in self.peca_ids]
+
+
+class OrgaoDimension:
+    """Divide uma consulta por órgão expedidor, descendo na árvore quando preciso."""
+
+    def __init__(self, orgaos):
+        """
+        orgaos is the tree, or a function returning it, called the first
+        time a query has to be split (the portal is only asked when needed).
+        """
+        self._source = orgaos
+        self._orgaos = None
+        self._filhos = {}
+
+    @property
+    def orgaos(self):
+        if self._orgaos is None:
+            self._orgaos = self._source() if callable(self._source) else self._source
+            self._index(self._orgaos)
+        return self._orgaos
+
+    def _index(self, orgaos):
+        for orgao in orgaos:
+            self._filhos[orgao['id']] = orgao.get('filhos', [])
+            self._index(orgao.get('filhos', []))
+
+    @staticmethod
+    def _orgao(orgao):
+        return {key: value for key, value in orgao.items() if key != 'filhos'}
+
+    def split(self, body):
+        atual = body.get('orgaoExpeditor') or {}
+        if not atual:
+            return [{'orgaoExpeditor': self._orgao(orgao), 'buscaOrgaoRecursivo': True} for orgao in self.orgaos]
+
+        filhos = self._filhos.get(atual.get('id'), []) if self.orgaos else []
+        if not body.get('buscaOrgaoRecursivo') or not filhos:
+            return []
+        # O próprio órgão (sem recursão) mais cada subárvore filha
+        return [{'orgaoExpeditor': atual, 'buscaOrgaoRecursivo': False}] + [
+            {'orgaoExpeditor': self._orgao(filho), 'buscaOrgaoRecursivo': True} for filho in filhos
+        ]
+
+
+# Chaves com os filhos de um órgão, ou com o id do órgão pai, nas respostas do portal
+_CHILD_KEYS = ('filhos', 'orgaosFilhos', 'children')
+_PARENT_KEYS = ('idOrgaoPai', 'idPai', 'idOrgaoSuperior')
+
+
+def _orgao_tree(orgaos):
+    """
+    Normalize the portal's órgãos (nested under a children key, or flat with
+    a parent id) into [{..., 'filhos': [...]}].
+    """
+    nodes, roots = {}, []
+    for orgao in orgaos:
+        if not isinstance(orgao, dict) or orgao.get('id') is None:
+            continue
+        node = {key: value for key, value in orgao.items() if key not in _CHILD_KEYS + _PARENT_KEYS}
+        children = next((orgao[key] for key in _CHILD_KEYS if isinstance(orgao.get(key), list)), [])
+        node['filhos'] = _orgao_tree(children)
+        parent = next((orgao[key] for key in _PARENT_KEYS if orgao.get(key) is not None), None)
+        nodes[orgao['id']] = (node, parent)
+    for node, parent in nodes.values():
+        if parent in nodes:
+            nodes[parent][0]['filhos'].append(node)
+        else:
+            roots.append(node)
+    return roots
+
+
+def fetch_orgaos(session, id_estado):
+    """
+    Download the órgão tree of a state from the portal; [] when it cannot be
+    read. Network errors propagate.
+    """
+    transport = session.transport
+    response = session.request(lambda: transport.get_orgaos(id_estado))
+    try:
+        data = response.json() if response.status_code == 200 else None
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data = data.get('content')
+    if not isinstance(data, list):
+        print(f"Aviso: a árvore de órgãos do estado {id_estado} não pôde ser lida (HTTP {response.status_code}).")
+        return []
+    return _orgao_tree(data)
+
+
+def load_orgaos(id_estado, path=ORGAOS_FILE, session=None):
+    """
+    Órgão tree of a state, from path when it has one, else fetched from the
+    portal through session and saved to path for the next runs.
+    """
+    saved = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            saved = json.load(file)
+        if not isinstance(saved, dict):
+            return saved
+        if str(id_estado) in saved:
+            return saved[str(id_estado)]
+    if session is None:
+        return []
+
+    try:
+        orgaos = fetch_orgaos(session, id_estado)
+    except requests.RequestException as e:
+        print(f"Aviso: a árvore de órgãos do estado {id_estado} não pôde ser baixada: {e}")
+        orgaos = []
+    if orgaos:
+        saved[str(id_estado)] = orgaos
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(saved, file, ensure_ascii=False)
+    else:
+        print(f"Aviso: sem a árvore de órgãos do estado {id_estado}, só a divisão por tipo de peça está disponível.")
+    return orgaos
+
+
+def count(session, body):
+    """
+    Total of items matched by a filter body (one single-item page request),
+    sent through the session so a 401 renews it and a 5xx is retried.
+    """
+    transport = session.transport
+    response = session.request(lambda: transport.post_filter({'page': '0', 'size': '1', 'sort': ''}, body))
+    response.raise_for_status()
+    return response.json().get('totalElements', 0)
+
+
+class QueryPlanner:
+    def __init__(self, session, dimensions, max_items):
+        """
+        Split a filter body into disjoint sub-queries of at most max_items
+        items each, trying the dimensions in order and splitting again
+        while a sub-query is still too large. A split whose sub-queries do
+        not add up to the query's total (the portal ignored the filter) is
+        discarded and the query is listed unpartitioned.
+        """
+        self.session = session
+        self.dimensions = dimensions
+        self.max_items = max_items
+
+    def iter_plan(self, body):
+        """
+        Yield the sub-queries as (body, total) while planning, so they can be
+        listed before the whole plan is known.
+        """
+        total = count(self.session, body)
+        leaves = planned = 0
+        for leaf in self._plan(body, total):
+            leaves += 1
+            planned += leaf[1]
+            yield leaf
+        print(f"Consulta dividida em {leaves} subconsultas ({planned} itens, {total} na consulta completa).")
+
+    def _split(self, body, total):
+        """
+        Children (body, total) of the first dimension whose split adds up to
+        total, or None when no dimension can split body.
+        """
+        for dimension in self.dimensions:
+            patches = dimension.split(body)
+            if not patches:
+                continue
+            children = []
+            for patch in patches:
+                child = copy.deepcopy(body)
+                child.update(patch)
+                children.append((child, count(self.session, child)))
+            planned = sum(child_total for _, child_total in children)
+            if abs(planned - total) <= total * SPLIT_TOLERANCE:
+                return children
+            print(f"Aviso: a divisão por {type(dimension).__name__} soma {planned} itens, "
+                  f"mas a subconsulta tem {total}; divisão descartada.")
+        return None
+
+    def _plan(self, body, total):
+        if total <= self.max_items:
+            if total:
+                yield body, total
+            return
+        children = self._split(body, total)
+        if children is None:
+            print(f"Aviso: subconsulta com {total} itens (limite {self.max_items}) não pode ser dividida e será "
+              f"paginada além do limite de profundidade: {json.dumps(body, ensure_ascii=False)}")
+            yield body, total
+            return
+        for child, child_total in children:
+            yield from self._plan(child, child_total)
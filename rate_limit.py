@@ -0,0 +1,189 @@
+import collections
+import multiprocessing
+import threading
+import time
+from metrics import METRICS
+
+# Controle AIMD: sobe ADDITIVE_INCREASE req/s a cada HEALTHY_WINDOW respostas
+# saudáveis e multiplica por DECREASE_FACTOR em 401/429/5xx, falhas de rede
+# ou latência sustentadamente alta
+ADDITIVE_INCREASE = 0.5
+DECREASE_FACTOR = 0.5
+HEALTHY_WINDOW = 20
+# Latência alta: a mediana das últimas LATENCY_WINDOW respostas acima de LATENCY_SPIKE_FACTOR
+# vezes a latência de base (e acima de LATENCY_FLOOR segundos) por LATENCY_SPIKE_COUNT
+# respostas seguidas; respostas lentas isoladas (a cauda normal da latência) não contam
+LATENCY_WINDOW = 20
+LATENCY_SPIKE_FACTOR = 2.0
+LATENCY_SPIKE_COUNT = 5
+LATENCY_FLOOR = 1.0
+# Peso de cada resposta na média móvel de latência
+LATENCY_EWMA_WEIGHT = 0.05
+# Latência de base: a menor média das últimas LATENCY_BASE_SAMPLES janelas de LATENCY_WINDOW
+# respostas, para que uma subida gradual (o portal saturando aos poucos) não vire a nova
+# referência, mas uma mudança duradoura seja aceita depois de algumas centenas de respostas
+LATENCY_BASE_SAMPLES = 25
+# Respostas já enviadas quando a taxa caiu não derrubam a taxa de novo
+DECREASE_COOLDOWN = 2.0
+MIN_RATE = 0.5
+MAX_RATE = 50
+BACKOFF_STATUSES = (401, 429)
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        """
+        Token bucket shared by every thread that calls acquire().
+        A rate of None (or 0) disables the ceiling.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a request may be sent under the configured rate.
+        """
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedRateLimiter:
+    def __init__(self, rate, burst=1):
+        """
+        Token bucket kept in shared memory, so worker processes started with
+        it (through inheritance) draw from a single global budget.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = multiprocessing.Value('d', burst, lock=False)
+        self._last = multiprocessing.Value('d', time.time(), lock=False)
+        self._lock = multiprocessing.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.time()
+                tokens = min(self.burst, self._tokens.value + (now - self._last.value) * self.rate)
+                self._last.value = now
+                if tokens >= 1:
+                    self._tokens.value = tokens - 1
+                    return
+                self._tokens.value = tokens
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    def __init__(self, rate, min_rate=MIN_RATE, max_rate=MAX_RATE, ceiling=None):
+        """
+        Token bucket whose rate follows the server (AIMD): feed it every
+        response through record() and it probes upwards while responses are
+        healthy and halves the rate on errors or a sustained latency rise.
+        An optional ceiling limiter (e.g. a SharedRateLimiter) is also
+        honoured on every acquire().
+        """
+        super().__init__(rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.ceiling = ceiling
+        self.latency = None
+        self.recent = collections.deque(maxlen=LATENCY_WINDOW)
+        self._base_samples = collections.deque(maxlen=LATENCY_BASE_SAMPLES)
+        self._responses = 0
+        self.decisions = collections.deque(maxlen=100)
+        self._healthy = 0
+        self._spikes = 0
+        self._last_decrease = 0.0
+
+    def acquire(self):
+        super().acquire()
+        if self.ceiling is not None:
+            self.ceiling.acquire()
+
+    def record(self, status_code, latency):
+        """
+        Feed back one response (status_code None for a network failure) and
+        its latency in seconds.
+        """
+        with self._lock:
+            if status_code is None:
+                self._decrease('rede', 'falha de rede')
+                return
+            if status_code in BACKOFF_STATUSES or status_code >= 500:
+                self._decrease('status', f'status {status_code}')
+                return
+
+            self.latency = latency if self.latency is None else (
+                self.latency + LATENCY_EWMA_WEIGHT * (latency - self.latency)
+            )
+            self.recent.append(latency)
+            self._responses += 1
+            if self._responses % LATENCY_WINDOW == 0:
+                self._base_samples.append(self.latency)
+            base = min(self._base_samples, default=self.latency)
+            median = sorted(self.recent)[len(self.recent) // 2]
+            if len(self.recent) == LATENCY_WINDOW and median > max(LATENCY_FLOOR, base * LATENCY_SPIKE_FACTOR):
+                self._spikes += 1
+                if self._spikes >= LATENCY_SPIKE_COUNT:
+                    self._spikes = 0
+                    self._decrease('latencia', f'latência mediana {median:.2f}s (base {base:.2f}s)')
+                return
+            self._spikes = 0
+            self._healthy += 1
+            if self._healthy >= HEALTHY_WINDOW and self.rate < self.max_rate:
+                self._set_rate(min(self.max_rate, self.rate + ADDITIVE_INCREASE), 'aumento', 'saudavel',
+                               'respostas saudáveis')
+
+    def _decrease(self, cause, reason):
+        now = time.monotonic()
+        if now - self._last_decrease < DECREASE_COOLDOWN:
+            return
+        self._last_decrease = now
+        self._set_rate(max(self.min_rate, self.rate * DECREASE_FACTOR), 'reducao', cause, reason)
+
+    def _set_rate(self, rate, action, cause, reason):
+        # A decisão vai para as métricas (e para a linha de progresso via describe), não para o stdout
+        self.rate = rate
+        self._healthy = 0
+        self.decisions.append((time.time(), action, rate, reason))
+        METRICS.inc('bnmp_rate_decisions_total', acao=action, motivo=cause)
+
+    def stats(self):
+        """
+        Current rate, latency average and last decision, for progress reports.
+        """
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'latency': self.latency,
+                'last_decision': self.decisions[-1] if self.decisions else None,
+            }
+
+
+def describe(limiter):
+    """
+    One-line summary of an adaptive limiter ('' for any other limiter).
+    """
+    stats = getattr(limiter, 'stats', None)
+    if stats is None:
+        return ''
+    stats = stats()
+    latency = '-' if stats['latency'] is None else f"{stats['latency']:.2f}s"
+    last = stats['last_decision']
+    last = f" (última {last[1]}: {last[3]})" if last is not None and last[1] == 'reducao' else ''
+    return f"taxa {stats['rate']:.2f} req/s, latência média {latency}{last}"
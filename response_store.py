@@ -0,0 +1,269 @@
+import glob
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import time
+from checkpoint import result_outcome
+from metrics import METRICS
+
+# Respostas brutas: segmentos NDJSON comprimidos + índice (id, peca) -> posição
+RESPONSES_DIR = '3.respostas'
+INDEX_FILE = 'indice.sqlite'
+# Registros acumulados em memória antes de gravar um bloco (ou a cada FLUSH_INTERVAL segundos)
+FLUSH_RECORDS = 500
+FLUSH_INTERVAL = 5
+# Tamanho (comprimido) a partir do qual um novo segmento é aberto
+SEGMENT_BYTES = 64 * 1024 * 1024
+COMPRESSION_LEVEL = 6
+
+# Leitura de um segmento em ordem de arquivo (e por faixa de blocos) sem varrer a tabela
+SEGMENT_INDEX = 'CREATE INDEX IF NOT EXISTS respostas_segmento ON respostas (segment, offset, line)'
+# Fim aberto de uma faixa de blocos
+_END = 2 ** 63 - 1
+
+# Um registro novo só substitui o anterior do mesmo id se for sucesso ou se o anterior também for erro
+UPSERT = '''
+    INSERT INTO respostas (id, peca, segment, offset, length, line, ok) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET
+        peca = excluded.peca, segment = excluded.segment, offset = excluded.offset,
+        length = excluded.length, line = excluded.line, ok = excluded.ok
+    WHERE excluded.ok OR NOT respostas.ok
+'''
+
+
+class ResponseStore:
+    def __init__(self, directory, flush_records=FLUSH_RECORDS, flush_interval=FLUSH_INTERVAL,
+                 segment_bytes=SEGMENT_BYTES, on_flush=None):
+        """
+        Append-only store for the raw detail responses, with id-keyed upsert
+        semantics: the index points every id at its latest successful record
+        (or its latest error while it has no success), and scans only yield
+        those records, so each warrant comes out exactly once.
+        Records are buffered and written as one gzip member per block, so each
+        segment is a plain .ndjson.gz file and any block can be decompressed on
+        its own. Every flush is fsynced and then committed to the SQLite index
+        together with the segment's new size; on_flush(results) is called after
+        that commit, when the block is durable.
+        Opening an existing store drops whatever was written after the last
+        commit.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.segment_bytes = segment_bytes
+        self.on_flush = on_flush
+        self.conn = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                id TEXT PRIMARY KEY,
+                peca TEXT NOT NULL,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                line INTEGER NOT NULL,
+                ok INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS segmentos (
+                segment TEXT PRIMARY KEY,
+                size INTEGER NOT NULL
+            );
+        """)
+        self.conn.execute(SEGMENT_INDEX)
+        self.conn.commit()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._restore()
+
+    def _restore(self):
+        committed = dict(self.conn.execute('SELECT segment, size FROM segmentos'))
+        for path in glob.glob(os.path.join(self.directory, 'seg-*.ndjson.gz')):
+            name = os.path.basename(path)
+            if name not in committed:
+                os.remove(path)
+            elif os.path.getsize(path) > committed[name]:
+                print(f"Descartando blocos não confirmados em '{path}'.")
+                with open(path, 'r+b') as file:
+                    file.truncate(committed[name])
+        self.segment = max(committed, default=self._segment_name(1))
+        self.segment_size = committed.get(self.segment, 0)
+
+    @staticmethod
+    def _segment_name(number):
+        return f'seg-{number:06d}.ndjson.gz'
+
+    def _rotate(self):
+        number = int(self.segment[len('seg-'):-len('.ndjson.gz')]) + 1
+        self.segment = self._segment_name(number)
+        self.segment_size = 0
+
+    def append(self, result):
+        self._buffer.append(result)
+        if len(self._buffer) >= self.flush_records or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        results, self._buffer = self._buffer, []
+
+        lines = [json.dumps(result, ensure_ascii=False).encode('utf-8') for result in results]
+        block = gzip.compress(b'\n'.join(lines) + b'\n', compresslevel=COMPRESSION_LEVEL, mtime=0)
+        if self.segment_size and self.segment_size + len(block) > self.segment_bytes:
+            self._rotate()
+
+        offset = self.segment_size
+        with open(os.path.join(self.directory, self.segment), 'ab') as file:
+            file.write(block)
+            file.flush()
+            os.fsync(file.fileno())
+        self.segment_size = offset + len(block)
+        METRICS.inc('bnmp_bytes_written_total', len(block), arquivo='respostas')
+
+        with self.conn:
+            self.conn.executemany(UPSERT, [
+                (str(result['id']), result.get('peca') or '', self.segment, offset, len(block), line,
+                 int(result_outcome(result) == 'ok'))
+                for line, result in enumerate(results)
+            ])
+            self.conn.execute(
+                'INSERT OR REPLACE INTO segmentos (segment, size) VALUES (?, ?)', (self.segment, self.segment_size)
+            )
+        if self.on_flush is not None:
+            self.on_flush(results)
+
+    def get(self, id_valor, peca=None):
+        """
+        Read one saved record by id (and peça, when an id has several).
+        Returns the decoded dict or None. Only reads its own block.
+        """
+        query = 'SELECT segment, offset, length, line FROM respostas WHERE id = ?'
+        args = [str(id_valor)]
+        if peca is not None:
+            query += ' AND peca = ?'
+            args.append(peca)
+        row = self.conn.execute(query, args).fetchone()
+        if row is None:
+            return None
+        segment, offset, length, line = row
+        with open(os.path.join(self.directory, segment), 'rb') as file:
+            file.seek(offset)
+            block = gzip.decompress(file.read(length))
+        return json.loads(block.split(b'\n')[line])
+
+    def segments(self):
+        return segment_paths(self.directory)
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM respostas').fetchone()[0]
+
+    def clear(self):
+        """
+        Drop every segment and index entry (a fresh run).
+        """
+        self._buffer = []
+        with self.conn:
+            self.conn.execute('DELETE FROM respostas')
+            self.conn.execute('DELETE FROM segmentos')
+        self._restore()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, 'seg-*.ndjson.gz')))
+
+
+def live_slices(directory, records):
+    """
+    Split the current records of a store directory into slices of whole
+    blocks holding about records records each, in file order:
+    [(segment path, first block offset, end offset or None)].
+    """
+    conn = sqlite3.connect(os.path.join(directory, INDEX_FILE))
+    try:
+        # Stores gravados antes do índice por segmento o ganham aqui, uma única vez
+        with conn:
+            conn.execute(SEGMENT_INDEX)
+        blocks = conn.execute(
+            'SELECT segment, offset, COUNT(*) FROM respostas GROUP BY segment, offset ORDER BY segment, offset'
+        ).fetchall()
+    finally:
+        conn.close()
+
+    slices, current, count = [], None, 0
+    for segment, offset, block_count in blocks:
+        if current is not None and (segment != current[0] or count >= records):
+            slices.append((current[0], current[1], offset if segment == current[0] else None))
+            current = None
+        if current is None:
+            current, count = (segment, offset), 0
+        count += block_count
+    if current is not None:
+        slices.append((current[0], current[1], None))
+    return [(os.path.join(directory, segment), start, end) for segment, start, end in slices]
+
+
+def iter_live(directory, segment_path, start=0, end=None):
+    """
+    Yield the raw lines (bytes) of one segment that are still current in the
+    index, reading each block once. start and end restrict the read to the
+    blocks at offsets [start, end). Safe to call from several processes.
+    """
+    # O cursor é percorrido aos poucos pelo índice (segment, offset, line): sem ordenação
+    # nem carregar o índice do segmento inteiro
+    conn = sqlite3.connect(os.path.join(directory, INDEX_FILE))
+    try:
+        rows = conn.execute(
+            'SELECT offset, length, line FROM respostas WHERE segment = ? AND offset >= ? AND offset < ? '
+            'ORDER BY offset, line',
+            (os.path.basename(segment_path), start, _END if end is None else end),
+        )
+        with open(segment_path, 'rb') as file:
+            block_offset, lines = None, None
+            for offset, length, line in rows:
+                if offset != block_offset:
+                    file.seek(offset)
+                    block_offset, lines = offset, gzip.decompress(file.read(length)).split(b'\n')
+                yield lines[line]
+    finally:
+        conn.close()
+
+
+def merge_stores(sources, directory):
+    """
+    Build one store in directory from {prefix: source_directory}, copying the
+    segments (renamed seg-<prefix>-...) and their index entries.
+    """
+    with ResponseStore(directory) as target:
+        target.clear()
+        for prefix, source in sources.items():
+            if not os.path.exists(os.path.join(source, INDEX_FILE)):
+                continue
+            with ResponseStore(source) as store:
+                rows = store.conn.execute('SELECT id, peca, segment, offset, length, line, ok FROM respostas').fetchall()
+                sizes = store.conn.execute('SELECT segment, size FROM segmentos').fetchall()
+            renamed = {segment: f'seg-{prefix}-{segment[len("seg-"):]}' for segment, _ in sizes}
+            for segment, new_name in renamed.items():
+                shutil.copyfile(os.path.join(source, segment), os.path.join(directory, new_name))
+            with target.conn:
+                target.conn.executemany(UPSERT, [
+                    (id_valor, peca, renamed[segment], offset, length, line, ok)
+                    for id_valor, peca, segment, offset, length, line, ok in rows
+                ])
+                target.conn.executemany(
+                    'INSERT OR REPLACE INTO segmentos (segment, size) VALUES (?, ?)',
+                    [(renamed[segment], size) for segment, size in sizes],
+                )
@@ -0,0 +1,155 @@
+import glob
+import multiprocessing
+import os
+import shutil
+import sys
+from bnmp import BNMPScraper, run_postprocessing, OUTPUT_DIR
+from checkpoint import CheckpointStore, CHECKPOINT_FILE
+from detail_fetcher import MAX_REQUESTS_PER_SECOND
+from rate_limit import AdaptiveRateLimiter, SharedRateLimiter
+from response_store import merge_stores, RESPONSES_DIR
+from stage_io import stage_path
+from session import BrowserSession, open_session
+from transport import BNMPTransport
+
+# Diretório de cada estado: output/estados/<UF>
+SHARDS_DIR = os.path.join(OUTPUT_DIR, 'estados')
+# Estados raspados ao mesmo tempo (um processo cada)
+MAX_PARALLEL_SHARDS = 4
+# Teto de requisições por segundo somando todos os processos
+GLOBAL_REQUESTS_PER_SECOND = 10
+
+# idEstado do portal, na ordem alfabética do nome do estado (25 = SP)
+UF_IDS = {
+    'AC': 1, 'AL': 2, 'AP': 3, 'AM': 4, 'BA': 5, 'CE': 6, 'DF': 7, 'ES': 8, 'GO': 9,
+    'MA': 10, 'MT': 11, 'MS': 12, 'MG': 13, 'PA': 14, 'PB': 15, 'PR': 16, 'PE': 17,
+    'PI': 18, 'RJ': 19, 'RN': 20, 'RS': 21, 'RO': 22, 'RR': 23, 'SC': 24, 'SP': 25,
+    'SE': 26, 'TO': 27,
+}
+
+_rate_limiter = None
+
+
+def shard_dir(uf):
+    return os.path.join(SHARDS_DIR, uf)
+
+
+def shard_checkpoint(uf):
+    return CheckpointStore(os.path.join(shard_dir(uf), os.path.basename(CHECKPOINT_FILE)))
+
+
+def _shard_complete(uf):
+    if not os.path.exists(os.path.join(shard_dir(uf), os.path.basename(CHECKPOINT_FILE))):
+        return False
+    checkpoint = shard_checkpoint(uf)
+    try:
+        return checkpoint.is_complete()
+    finally:
+        checkpoint.close()
+
+
+def _init_worker(rate_limiter):
+    global _rate_limiter
+    _rate_limiter = rate_limiter
+
+
+def crawl_shard(args):
+    """
+    Crawl one UF in a worker process; returns (uf, error message or None).
+    """
+    uf, cookies = args
+    # Cada shard se adapta ao portal sem passar do teto global compartilhado
+    transport = BNMPTransport(rate_limiter=AdaptiveRateLimiter(MAX_REQUESTS_PER_SECOND, ceiling=_rate_limiter))
+    try:
+        scraper = BNMPScraper(cookies, None, transport, output_dir=shard_dir(uf), id_estado=UF_IDS[uf])
+        scraper.scrape()
+        scraper.responses.close()
+        # Listagem interrompida (bloqueio, erro de página): o shard não pode entrar na mescla
+        if not scraper.listing_complete:
+            return uf, "listagem incompleta; execute de novo para retomar do checkpoint"
+        return uf, None
+    except Exception as e:
+        return uf, f"{type(e).__name__}: {e}"
+    finally:
+        transport.close()
+
+
+def run(cookies, ufs=tuple(UF_IDS), processes=MAX_PARALLEL_SHARDS, rate=GLOBAL_REQUESTS_PER_SECOND):
+    """
+    Crawl the given UFs in parallel processes sharing one request budget.
+    Shards already finished by an earlier run (and not merged yet) are
+    skipped. Returns the list of UFs that failed (re-running resumes them
+    from their checkpoints).
+    """
+    pending = []
+    for uf in ufs:
+        if _shard_complete(uf):
+            print(f"[{uf}] Concluído em execução anterior; shard pulado.")
+        else:
+            pending.append(uf)
+
+    rate_limiter = SharedRateLimiter(rate)
+    failed = []
+    if not pending:
+        return failed
+    with multiprocessing.Pool(min(processes, len(pending)), initializer=_init_worker,
+                              initargs=(rate_limiter,)) as pool:
+        for uf, error in pool.imap_unordered(crawl_shard, [(uf, cookies) for uf in pending]):
+            if error:
+                failed.append(uf)
+                print(f"[{uf}] Falhou: {error}")
+            else:
+                print(f"[{uf}] Concluído.")
+    return failed
+
+
+def merge_shards(ufs=tuple(UF_IDS), output_dir=OUTPUT_DIR):
+    """
+    Build the national listing and responses files from the shard outputs,
+    so the usual post-processing runs once over the whole country.
+    """
+    listing_dir = stage_path('dados_gerais', output_dir)
+    shutil.rmtree(listing_dir, ignore_errors=True)
+    os.makedirs(listing_dir)
+
+    for uf in ufs:
+        for part in glob.glob(os.path.join(stage_path('dados_gerais', shard_dir(uf)), '*.parquet')):
+            shutil.copyfile(part, os.path.join(listing_dir, f'{uf}-{os.path.basename(part)}'))
+
+    merge_stores(
+        {uf: os.path.join(shard_dir(uf), RESPONSES_DIR) for uf in ufs},
+        os.path.join(output_dir, RESPONSES_DIR),
+    )
+    print(f"Shards {', '.join(ufs)} mesclados em '{output_dir}'.")
+
+
+def main(ufs=tuple(UF_IDS)):
+    """
+    Crawl the given UFs and, when all of them finish, merge the shards.
+    Returns True on success.
+    """
+    # Os shards não têm navegador: a sessão é validada (ou renovada) antes de começar
+    browser = BrowserSession()
+    transport = BNMPTransport()
+    cookies_dict = open_session(transport, browser)
+    transport.close()
+    browser.quit()
+
+    failed = run(cookies_dict, ufs)
+    if failed:
+        print(f"Estados com falha: {', '.join(failed)}. Rode novamente para retomar do checkpoint.")
+        return False
+    merge_shards(ufs)
+    # Só depois da mescla os shards podem recomeçar do zero na próxima raspagem
+    for uf in ufs:
+        checkpoint = shard_checkpoint(uf)
+        try:
+            checkpoint.reset()
+        finally:
+            checkpoint.close()
+    return True
+
+
+if __name__ == "__main__":
+    if main([uf.upper() for uf in sys.argv[1:]] or list(UF_IDS)):
+        run_postprocessing()
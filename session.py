@@ -0,0 +1,253 @@
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import requests
+from transport import BASE_URL, SessionExpiredError
+from metrics import METRICS
+
+# Cookies da última sessão válida, reaproveitados entre execuções
+SESSION_FILE = os.environ.get('BNMP_SESSION_FILE', 'output/sessao.json')
+CHROME_DRIVER_PATH = "C:\\webdriver\\chromedriver.exe"  # "/usr/bin/chromedriver" no linux
+CAPTCHA_URL = f'{BASE_URL}/#/captcha/'
+# Sem terminal/navegador: grave os cookies novos em SESSION_FILE e crie este
+# arquivo (ou envie SIGUSR1 ao processo) para os workers voltarem
+RENEW_TRIGGER_FILE = os.environ.get('BNMP_RENEW_TRIGGER', 'output/renovar_sessao')
+TRIGGER_POLL_INTERVAL = 2
+# Requisições da listagem com 429/5xx são repetidas até TRANSIENT_RETRIES vezes,
+# esperando TRANSIENT_DELAY segundos (dobrando a cada tentativa)
+TRANSIENT_RETRIES = 4
+TRANSIENT_DELAY = 2
+# Renovações de sessão aceitas para uma mesma requisição
+MAX_RENEWALS = 5
+
+# Consulta mínima (um item) usada para testar e manter viva a sessão
+PROBE_PARAMS = {'page': '0', 'size': '1', 'sort': ''}
+PROBE_BODY = {'buscaOrgaoRecursivo': False, 'orgaoExpeditor': {}, 'idEstado': 25}
+
+
+def load_cookies(path=SESSION_FILE):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_cookies(cookies, path=SESSION_FILE):
+    """
+    Write the cookie jar atomically, readable only by the current user.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as file:
+        json.dump(cookies, file)
+    os.replace(tmp_path, path)
+
+
+def probe(transport):
+    """
+    Whether the transport's cookies still open the API (one single-item
+    listing request): True on 200, False on 401 and None when the answer
+    says nothing about the session (429, 5xx...). Network errors propagate
+    to the caller.
+    """
+    response = transport.post_filter(PROBE_PARAMS, PROBE_BODY)
+    if response.status_code == 401:
+        return False
+    return True if response.status_code == 200 else None
+
+
+class BrowserSession:
+    def __init__(self, driver_path=CHROME_DRIVER_PATH):
+        """
+        Chrome is only started the first time a CAPTCHA has to be solved.
+        """
+        self.driver_path = driver_path
+        self._driver = None
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.options import Options
+            from selenium.webdriver.chrome.service import Service
+            self._driver = webdriver.Chrome(service=Service(self.driver_path), options=Options())
+        return self._driver
+
+    def solve_captcha(self, prompt="Por favor, resolva o CAPTCHA e pressione Enter para continuar..."):
+        """
+        Let a human solve the CAPTCHA and return the new {name: value} cookies.
+        """
+        self.driver.get(CAPTCHA_URL)
+        input(prompt)
+        return {cookie['name']: cookie['value'] for cookie in self.driver.get_cookies()}
+
+    def quit(self):
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+
+def renew_session(transport, browser, path=SESSION_FILE):
+    """
+    Get fresh cookies through the browser, install them in the transport and
+    persist them. Returns the cookies.
+    """
+    if browser is None:
+        # Processos de shard não têm navegador nem terminal para o CAPTCHA
+        raise SessionExpiredError("Sessão expirada e nenhum navegador disponível para resolver o CAPTCHA.")
+    cookies = browser.solve_captcha()
+    transport.set_cookies(cookies)
+    save_cookies(cookies, path)
+    return cookies
+
+
+def open_session(transport, browser=None, path=SESSION_FILE):
+    """
+    Reuse the persisted cookies unless the API refuses them with a 401,
+    otherwise fall back to the browser. Returns the cookies installed in the transport.
+    """
+    cookies = load_cookies(path)
+    if cookies:
+        transport.set_cookies(cookies)
+        try:
+            valid = probe(transport)
+        except requests.RequestException as e:
+            print(f"Não foi possível testar a sessão salva: {e}")
+            valid = None
+        if valid:
+            print("Sessão salva ainda válida; navegador não será aberto.")
+            return cookies
+        # Portal instável (5xx, rede): a sessão não foi recusada, um 401 depois a renova
+        if valid is None:
+            print("Não foi possível confirmar a sessão salva; reutilizando os cookies.")
+            return cookies
+        print("Sessão salva expirada.")
+    return renew_session(transport, browser, path)
+
+
+class SessionCoordinator:
+    def __init__(self, transport, browser=None, path=SESSION_FILE, trigger_file=RENEW_TRIGGER_FILE):
+        """
+        Shared session state for every thread using the transport.
+        The first 401 of a generation flips it to invalid; workers park in
+        wait() (without spending their retries) while a single background
+        renewal runs, and all resume together once the new cookies are in.
+        Renewal prompts once in the browser when there is a terminal, else it
+        waits for the trigger file or SIGUSR1 and reloads the cookies file.
+        """
+        self.transport = transport
+        self.browser = browser
+        self.path = path
+        self.trigger_file = trigger_file
+        self.generation = 0
+        self._valid = threading.Event()
+        self._valid.set()
+        self._lock = threading.Lock()
+        self._signaled = threading.Event()
+        self._install_signal_handler()
+
+    def _install_signal_handler(self):
+        # Sinais só podem ser registrados pela thread principal
+        if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self._signaled.set())
+
+    @property
+    def valid(self):
+        return self._valid.is_set()
+
+    def wait(self):
+        """
+        Block while the session is invalid and return the current generation.
+        """
+        self._valid.wait()
+        return self.generation
+
+    def request(self, send):
+        """
+        Call send() (one HTTP request) under the session. A 401 invalidates
+        the generation it was sent with and repeats the request after the
+        renewal (up to MAX_RENEWALS times); a 429/5xx repeats it after a
+        growing delay. Returns the last response; network errors propagate.
+        """
+        renewals = transient = 0
+        while True:
+            generation = self.wait()
+            response = send()
+            if response.status_code == 401 and renewals < MAX_RENEWALS:
+                renewals += 1
+                self.invalidate(generation)
+                continue
+            if (response.status_code == 429 or response.status_code >= 500) and transient < TRANSIENT_RETRIES:
+                time.sleep(TRANSIENT_DELAY * 2 ** transient)
+                transient += 1
+                continue
+            return response
+
+    def invalidate(self, generation):
+        """
+        Report a 401 seen with the given generation. Only the first report of
+        a generation starts a renewal; the call never blocks.
+        """
+        with self._lock:
+            if generation != self.generation or not self._valid.is_set():
+                return
+            self._valid.clear()
+        METRICS.inc('bnmp_session_invalidations_total')
+        print("Sessão inválida: requisições pausadas até a renovação.")
+        threading.Thread(target=self._renew, name='renovacao-sessao', daemon=True).start()
+
+    def _renew(self):
+        start = time.monotonic()
+        cookies = None
+        if self.browser is not None and sys.stdin is not None and sys.stdin.isatty():
+            try:
+                cookies = renew_session(self.transport, self.browser, self.path)
+            except Exception as e:
+                print(f"Falha ao renovar a sessão pelo navegador: {e}")
+        while cookies is None:
+            cookies = self._wait_for_trigger()
+
+        with self._lock:
+            self.generation += 1
+            self._valid.set()
+        METRICS.inc('bnmp_session_renewals_total')
+        METRICS.observe('bnmp_session_renewal_seconds', time.monotonic() - start)
+        print("Sessão renovada: retomando as requisições.")
+
+    def _wait_for_trigger(self):
+        """
+        Wait for the operator to refresh the cookies file; returns the
+        cookies once the API accepts them, else None.
+        """
+        print(f"Grave os cookies novos em '{self.path}' e toque '{self.trigger_file}' "
+              f"(ou envie SIGUSR1 ao processo {os.getpid()}) para continuar.")
+        # O gatilho não é apagado: vários processos (shards) podem estar esperando por ele
+        since = time.time()
+        while not self._signaled.is_set() and not self._triggered_since(since):
+            time.sleep(TRIGGER_POLL_INTERVAL)
+        self._signaled.clear()
+
+        cookies = load_cookies(self.path)
+        self.transport.set_cookies(cookies)
+        try:
+            # Só um 401 recusa os cookies; um 5xx no teste não prende os workers de novo
+            if cookies and probe(self.transport) is not False:
+                return cookies
+        except requests.RequestException as e:
+            print(f"Não foi possível testar os cookies novos: {e}")
+            if cookies:
+                return cookies
+        print("Os cookies informados não abriram a API.")
+        return None
+
+    def _triggered_since(self, since):
+        try:
+            return os.path.getmtime(self.trigger_file) >= since
+        except OSError:
+            return False
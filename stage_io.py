@@ -0,0 +1,152 @@
+import glob
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from stage_paths import OUTPUT_DIR, STAGE_FILES, stage_path
+
+# Exportação opcional em Excel das etapas finais
+EXPORT_EXCEL = True
+EXCEL_EXPORTS = {
+    'mandados_bnmp': '7.mandados_bnmp.xlsx',
+}
+
+_DADOS_FINAIS = [
+    ('id', pa.int64()),
+    ('tipificacaoPenal', pa.list_(pa.string())),
+    ('cpf', pa.string()),
+    ('logradouro', pa.string()),
+    ('numero', pa.string()),
+    ('bairro', pa.string()),
+    ('municipio', pa.string()),
+    ('uf', pa.string()),
+    ('endereco_1', pa.string()),
+    ('endereco_chave', pa.string()),
+]
+_COORDENADAS = [
+    ('lat', pa.float64()),
+    ('lng', pa.float64()),
+]
+
+# Colunas com tipo garantido em cada etapa; as demais seguem o tipo inferido
+SCHEMAS = {
+    'dados_gerais': pa.schema([('id', pa.int64()), ('descricaoPeca', pa.string())]),
+    'dados_finais': pa.schema(_DADOS_FINAIS),
+    'dados_erros': pa.schema([
+        ('id', pa.int64()), ('peca', pa.string()), ('categoria', pa.string()),
+        ('status', pa.int64()), ('tentativas', pa.int64()), ('error', pa.string()),
+    ]),
+    'dados_geocodificados': pa.schema(_DADOS_FINAIS + _COORDENADAS),
+    'mandados_bnmp': pa.schema([('id', pa.int64()), ('cpf', pa.string())] + _COORDENADAS),
+}
+
+
+def to_table(df, stage):
+    """
+    Convert a DataFrame to an Arrow table, casting the columns declared in the
+    stage schema and adding any that are missing as nulls.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for field in SCHEMAS.get(stage, []):
+        if field.name in table.column_names:
+            index = table.schema.get_field_index(field.name)
+            table = table.set_column(index, field, table.column(index).cast(field.type))
+        else:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    return table
+
+
+class StageWriter:
+    def __init__(self, stage, path=None, schema=None):
+        """
+        Append DataFrame chunks to a stage file as they are produced.
+        Every chunk is cast to the given schema, or to the schema of the first
+        chunk. Final stages (EXCEL_EXPORTS) are also exported to Excel, streamed
+        from the finished file.
+        """
+        self.stage = stage
+        self.path = path or stage_path(stage)
+        self.schema = schema
+        self.writer = None
+        self.rows = 0
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        return self
+
+    def write(self, df):
+        if self.schema is not None:
+            df = df.assign(**{name: None for name in self.schema.names if name not in df})
+            table = pa.Table.from_pandas(df[self.schema.names], schema=self.schema, preserve_index=False)
+        else:
+            table = to_table(df, self.stage)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = table.select(self.writer.schema.names).cast(self.writer.schema)
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.writer is None:
+            # Nenhum lote: grava um arquivo vazio com o esquema da etapa
+            pq.write_table((self.schema or SCHEMAS.get(self.stage, pa.schema([]))).empty_table(), self.path)
+        else:
+            self.writer.close()
+
+        if exc_type is None and EXPORT_EXCEL and self.stage in EXCEL_EXPORTS and self.path == stage_path(self.stage):
+            export_stage_excel(self.stage, os.path.join(OUTPUT_DIR, EXCEL_EXPORTS[self.stage]))
+        return False
+
+
+def _excel_value(value):
+    if isinstance(value, (list, np.ndarray)):
+        return str(list(value))
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def export_stage_excel(stage, path, batch_size=10000):
+    """
+    Stream a stage file into an Excel sheet (write-only workbook), batch by
+    batch, without loading the whole stage.
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header = None
+    for batch in iter_stage(stage, batch_size):
+        if header is None:
+            header = list(batch.columns)
+            sheet.append(header)
+        for row in batch.itertuples(index=False, name=None):
+            sheet.append([_excel_value(value) for value in row])
+    workbook.save(path)
+
+
+def read_table(stage, path=None, columns=None):
+    """
+    Read a stage file, or a directory of part files whose columns may differ.
+    """
+    path = path or stage_path(stage)
+    if os.path.isdir(path):
+        parts = sorted(glob.glob(os.path.join(path, '*.parquet')))
+        if not parts:
+            return SCHEMAS.get(stage, pa.schema([])).empty_table()
+        table = pa.concat_tables([pq.read_table(part) for part in parts], promote_options='default')
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns)
+
+
+def iter_stage(stage, batch_size, path=None, columns=None):
+    """
+    Yield a stage file as DataFrames of at most batch_size rows.
+    """
+    path = path or stage_path(stage)
+    if os.path.isdir(path):
+        for batch in read_table(stage, path, columns).to_batches(batch_size):
+            yield batch.to_pandas()
+        return
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+        yield batch.to_pandas()
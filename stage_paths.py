@@ -0,0 +1,28 @@
+import os
+
+# Só caminhos e constantes, sem pandas/pyarrow: o pipeline monta o DAG sem importar as etapas
+
+OUTPUT_DIR = 'output'
+
+# Arquivos intermediários de cada etapa (Parquet; o Excel é só exportação final)
+STAGE_FILES = {
+    'dados_gerais': '2.dados_gerais.parquet',
+    'dados_finais': '4.dados_finais.parquet',
+    'dados_erros': '4.dados_erros.parquet',
+    'dados_geocodificados': '5.1.dados_geocodificados.parquet',
+    'mandados_bnmp': '7.mandados_bnmp.parquet',
+}
+
+# Centroides do geocodificador offline (GEOCODER=gazetteer); entrada da etapa de geocodificação
+GAZETTEER_FILE = os.environ.get('GAZETTEER_FILE', 'dados/gazetteer.csv')
+
+# Retorno de uma etapa que rodou mas ficou com pendências (ex.: endereços que o
+# geocodificador não resolveu): o pipeline não a guarda no cache e a roda de novo
+INCOMPLETE = 'incompleta'
+
+# Cópia de conferência das respostas (etapa opcional 'mesclagem')
+MERGED_FILE = os.path.join(OUTPUT_DIR, '5.merged_respostas.json')
+
+
+def stage_path(stage, output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, STAGE_FILES[stage])
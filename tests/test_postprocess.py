@@ -0,0 +1,35 @@
+from certidao_schema import decode_line
+from postprocess import process_record
+
+
+def _dado(line):
+    dado, erro = process_record(decode_line(line))
+    assert erro is None
+    return dado
+
+
+def test_float_numero_and_cpf_are_rendered_as_integers():
+    dado = _dado(
+        b'{"id": 1, "peca": "Mandado de Pris\\u00e3o", "response": {"pessoa": {'
+        b'"enderecos": [{"logradouro": "Rua A", "numero": 12.0}],'
+        b'"documento": [{"tipoDocumento": {"descricao": "CPF"}, "numero": 1234567890.0}]}}}'
+    )
+    assert dado['numero'] == '12'
+    assert dado['cpf'] == '01234567890'
+
+
+def test_null_lists_are_treated_as_empty():
+    dado = _dado(
+        b'{"id": 2, "peca": "Mandado de Pris\\u00e3o", "response": {'
+        b'"pessoa": {"enderecos": null, "documento": null}, "tipificacaoPenal": null}}'
+    )
+    assert dado['cpf'] is None
+    assert dado['numero'] is None
+    assert dado['tipificacaoPenal'] == []
+
+
+def test_invalid_record_keeps_id_and_peca():
+    dado, erro = process_record(decode_line(b'{"id": 3, "peca": "Contramandado", "response": {"pessoa": "x"}}'))
+    assert dado is None
+    assert (erro['id'], erro['peca']) == (3, 'Contramandado')
+    assert erro['error'].startswith('Registro inválido')
@@ -0,0 +1,72 @@
+import os
+from response_store import ResponseStore, iter_live, segment_paths
+
+
+def _ok(id_valor, nome='ok'):
+    return {'id': id_valor, 'peca': 'Mandado de Prisão', 'response': {'id': id_valor, 'nome': nome}}
+
+
+def _erro(id_valor):
+    return {'id': id_valor, 'peca': 'Mandado de Prisão', 'error': 'HTTP 503', 'categoria': 'transitoria'}
+
+
+def test_restore_truncates_bytes_after_the_last_flush(tmp_path):
+    with ResponseStore(str(tmp_path)) as store:
+        store.append(_ok(1))
+        store.flush()
+        segment = os.path.join(str(tmp_path), store.segment)
+        committed = os.path.getsize(segment)
+
+    # Bloco gravado no disco mas não confirmado no índice (queda no meio do flush)
+    with open(segment, 'ab') as file:
+        file.write(b'\x1f\x8b parcial')
+
+    with ResponseStore(str(tmp_path)) as store:
+        assert os.path.getsize(segment) == committed
+        assert len(store) == 1
+        store.append(_ok(2))
+        store.flush()
+        assert store.get(2)['response']['id'] == 2
+        lines = [line for path in segment_paths(str(tmp_path)) for line in iter_live(str(tmp_path), path)]
+        assert len(lines) == 2
+
+
+def test_restore_removes_uncommitted_segments(tmp_path):
+    with ResponseStore(str(tmp_path)) as store:
+        store.append(_ok(1))
+        store.flush()
+    orphan = os.path.join(str(tmp_path), 'seg-000099.ndjson.gz')
+    with open(orphan, 'wb') as file:
+        file.write(b'lixo')
+
+    with ResponseStore(str(tmp_path)) as store:
+        assert not os.path.exists(orphan)
+        assert store.get(1) is not None
+
+
+def test_success_replaces_an_earlier_error(tmp_path):
+    with ResponseStore(str(tmp_path)) as store:
+        store.append(_erro(1))
+        store.flush()
+        store.append(_ok(1))
+        store.flush()
+        assert store.get(1)['response'] == {'id': 1, 'nome': 'ok'}
+
+
+def test_error_does_not_replace_an_earlier_success(tmp_path):
+    with ResponseStore(str(tmp_path)) as store:
+        store.append(_ok(1))
+        store.flush()
+        store.append(_erro(1))
+        store.flush()
+        assert store.get(1)['response'] == {'id': 1, 'nome': 'ok'}
+        assert len(store) == 1
+
+
+def test_latest_success_wins(tmp_path):
+    with ResponseStore(str(tmp_path)) as store:
+        store.append(_ok(1, 'antigo'))
+        store.flush()
+        store.append(_ok(1, 'novo'))
+        store.flush()
+        assert store.get(1)['response']['nome'] == 'novo'
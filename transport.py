@@ -0,0 +1,109 @@
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import METRICS
+
+# Endereços do portal (BNMP_BASE_URL permite apontar para outro servidor)
+BASE_URL = os.environ.get('BNMP_BASE_URL', 'https://portalbnmp.cnj.jus.br')
+API_URL = f'{BASE_URL}/bnmpportal/api'
+FILTER_URL = f'{API_URL}/pesquisa-pecas/filter'
+# Árvore de órgãos expedidores de um estado, a mesma que o filtro de órgão do portal usa
+ORGAOS_URL = os.environ.get('BNMP_ORGAOS_URL', f'{API_URL}/orgaos/estado/{{id_estado}}')
+
+# Conexões mantidas abertas por host e política de novas tentativas
+POOL_SIZE = 20
+TIMEOUT = 30
+MAX_RETRIES = 5
+
+# Quando ativo, a certidão é pedida direto à API, sem o GET da página
+# '#/resumo-peca/...' (o fragmento nem chega ao servidor, só custa uma ida e volta)
+DIRECT_API = True
+
+HEADERS = {
+    'User-Agent': (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/86.0.4240.198 Safari/537.36"
+    )
+}
+
+
+class SessionExpiredError(Exception):
+    """A sessão do portal expirou e não há como renová-la neste processo."""
+
+
+class BNMPTransport:
+    def __init__(self, cookies=None, direct_api=DIRECT_API, pool_size=POOL_SIZE, timeout=TIMEOUT, rate_limiter=None):
+        """
+        Shared HTTP session with keep-alive pooling, cookie jar and retries.
+        """
+        self.direct_api = direct_api
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+
+        # Só falhas de conexão são repetidas pelo urllib3 (a requisição nem chegou ao portal);
+        # status HTTP voltam para quem chamou, passando pelo limitador a cada nova tentativa
+        retry = Retry(total=3, connect=3, read=0, status=0, other=0, backoff_factor=1, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        if cookies:
+            self.set_cookies(cookies)
+
+    @property
+    def cookies(self):
+        return self.session.cookies.get_dict()
+
+    def set_cookies(self, cookies):
+        """
+        Replace the cookie jar with a fresh {name: value} mapping.
+        """
+        self.session.cookies.clear()
+        self.session.cookies.update(cookies)
+
+    def request(self, method, url, endpoint='outro', **kwargs):
+        """
+        Send one request through the pool, feeding its status and latency to
+        the rate limiter and to the endpoint's metrics.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        # Limitadores adaptativos recebem status e latência de cada resposta
+        record = getattr(self.rate_limiter, 'record', None)
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except requests.RequestException:
+            latency = time.monotonic() - start
+            if record is not None:
+                record(None, latency)
+            METRICS.observe('bnmp_request_seconds', latency, endpoint=endpoint)
+            METRICS.inc('bnmp_requests_total', endpoint=endpoint, status='erro_rede')
+            raise
+        latency = time.monotonic() - start
+        if record is not None:
+            record(response.status_code, latency)
+        METRICS.observe('bnmp_request_seconds', latency, endpoint=endpoint)
+        METRICS.inc('bnmp_requests_total', endpoint=endpoint, status=response.status_code)
+        return response
+
+    def post_filter(self, params, json_data):
+        return self.request('POST', FILTER_URL, endpoint='listagem', params=params, json=json_data)
+
+    def get_orgaos(self, id_estado):
+        return self.request('GET', ORGAOS_URL.format(id_estado=id_estado), endpoint='orgaos')
+
+    def get_resumo_html(self, id_valor, peca_id):
+        html_url = f'{BASE_URL}/#/resumo-peca/{id_valor}/{peca_id}/%2Fpesquisa-peca'
+        return self.request('GET', html_url, endpoint='resumo')
+
+    def get_certidao(self, id_valor, peca_id):
+        json_url = f'{API_URL}/certidaos/{id_valor}/{peca_id}'
+        return self.request('GET', json_url, endpoint='certidao')
+
+    def close(self):
+        self.session.close()